@@ -0,0 +1,222 @@
+"""
+Compare end-to-end latency and token cost of the two answer modes offline.
+
+'pipeline' classifies, embeds, searches, then streams a summary in a second
+LLM call. 'tools' lets the answering model call search_reviews itself and
+streams the answer on the same response chain. The LLM, memory search and
+database are replaced by fakes with fixed latencies, so the numbers show the
+shape of each mode's critical path rather than real service times.
+
+Usage: python bench_answer_modes.py
+"""
+import io
+import json
+import statistics
+import tempfile
+import time
+import uuid
+from pathlib import Path
+from types import SimpleNamespace
+
+import cli.streaming
+import core.search
+import core.tools
+from cli.console import console
+from cli.streaming import build_prompt, build_tools_prompt, stream_response, stream_tool_response
+from core.clients import set_llm_client
+from core.models import QueryClassification
+from core.response_cache import ResponseCache
+from core.result_cache import SemanticResultCache
+from core.search import format_results_for_prompt, prepare_search
+from core.tools import SEARCH_TOOL, SearchToolRunner
+
+# Simulated service latencies (seconds)
+LLM_FIRST_TOKEN = 0.45
+LLM_PER_OUTPUT_TOKEN = 0.008
+EMBEDDING_LATENCY = 0.12
+MEMORY_LATENCY = 0.30
+DB_LATENCY = 0.03
+
+# USD per 1M tokens for the answering model
+INPUT_PRICE = 0.10
+OUTPUT_PRICE = 0.40
+
+BENCH_QUERIES = {
+    "cheap pinot noir from Oregon": QueryClassification(type='semantic', max_price=25),
+    "best wines from Roger Voss under $30": QueryClassification(
+        type='keyword', taster_name='Roger Voss', max_price=30
+    ),
+    "bold Napa cabernet over 92 points": QueryClassification(type='semantic', min_points=92),
+    "crisp white to go with oysters": QueryClassification(type='semantic'),
+}
+
+ANSWER_TEXT = (
+    "Here are a few wines that match what you asked for. The first is a bright, "
+    "cherry-driven red with soft tannins and a long finish, rated 91 points at $22. "
+    "The second is a little more structured, with earthy notes, rated 90 points at $19. "
+    "Both were reviewed by experienced tasters and offer good value for the price."
+)
+
+FAKE_ROW = {
+    'id': 1, 'title': 'Example Cellars 2015 Pinot Noir (Willamette Valley)',
+    'variety': 'Pinot Noir', 'winery': 'Example Cellars', 'country': 'US',
+    'province': 'Oregon', 'description': 'Bright cherry and cranberry fruit with a hint of spice.',
+    'points': 91, 'price': 22.0, 'taster_name': 'Paul Gregutt',
+    'taster_twitter_handle': '@paulgwine', 'similarity': 0.62,
+}
+
+
+def count_tokens(value) -> int:
+    text = value if isinstance(value, str) else json.dumps(value, default=str)
+    return max(len(text) // 4, 1)
+
+
+def query_from_prompt(prompt) -> str:
+    text = prompt if isinstance(prompt, str) else json.dumps(prompt)
+    for query in BENCH_QUERIES:
+        if query in text:
+            return query
+    return next(iter(BENCH_QUERIES))
+
+
+def check_strict_tool(tool):
+    """Reject a function tool the way the Responses API does unless its schema is strict."""
+    if tool.get('strict') is False:
+        return
+    parameters = tool['parameters']
+    if parameters.get('additionalProperties') is not False:
+        raise ValueError(f"{tool['name']}: strict schemas need additionalProperties: false")
+    missing = set(parameters['properties']) - set(parameters.get('required', []))
+    if missing:
+        raise ValueError(f"{tool['name']}: strict schemas must require every property: {sorted(missing)}")
+
+
+class FakeLLM:
+    """Offline stand-in for the OpenAI client that sleeps like one and counts tokens."""
+
+    def __init__(self):
+        self.responses = SimpleNamespace(parse=self._parse, create=self._create)
+        self.embeddings = SimpleNamespace(create=self._embed)
+        self.reset()
+
+    def reset(self):
+        self.llm_calls = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self._conversation_tokens = {}
+
+    def _bill(self, input_tokens: int, output_tokens: int):
+        self.llm_calls += 1
+        self.input_tokens += input_tokens
+        self.output_tokens += output_tokens
+
+    def _parse(self, model, input, text_format, timeout=None):
+        classification = BENCH_QUERIES[query_from_prompt(input)]
+        output_tokens = count_tokens(classification.model_dump_json())
+        self._bill(count_tokens(input) + count_tokens(text_format.model_json_schema()), output_tokens)
+        time.sleep(LLM_FIRST_TOKEN + output_tokens * LLM_PER_OUTPUT_TOKEN)
+        return SimpleNamespace(output_parsed=classification)
+
+    def _embed(self, model, input, timeout=None):
+        time.sleep(EMBEDDING_LATENCY)
+        return SimpleNamespace(data=[
+            SimpleNamespace(index=index, embedding=[0.01] * 1536) for index in range(len(input))
+        ])
+
+    def _create(self, model, input, stream=False, tools=None, tool_choice=None,
+                previous_response_id=None):
+        # The previous turn of the chain is billed again as input
+        input_tokens = count_tokens(input) + self._conversation_tokens.get(previous_response_id, 0)
+        if tools:
+            for tool in tools:
+                check_strict_tool(tool)
+            input_tokens += count_tokens(tools)
+
+        wants_tool = tools and tool_choice != 'none' and previous_response_id is None
+        if wants_tool:
+            # Strict tools get every field, with null for the ones not asked for
+            arguments = BENCH_QUERIES[query_from_prompt(input)].model_dump_json()
+            output_tokens = count_tokens(arguments)
+        else:
+            output_tokens = count_tokens(ANSWER_TEXT)
+
+        response_id = uuid.uuid4().hex
+        self._conversation_tokens[response_id] = input_tokens + output_tokens
+        self._bill(input_tokens, output_tokens)
+        return self._events(response_id, wants_tool, arguments if wants_tool else None)
+
+    def _events(self, response_id, wants_tool, arguments):
+        time.sleep(LLM_FIRST_TOKEN)
+        if wants_tool:
+            time.sleep(count_tokens(arguments) * LLM_PER_OUTPUT_TOKEN)
+            yield SimpleNamespace(
+                type="response.output_item.done",
+                item=SimpleNamespace(
+                    type="function_call", name=SEARCH_TOOL['name'],
+                    arguments=arguments, call_id=uuid.uuid4().hex
+                )
+            )
+        else:
+            for word in ANSWER_TEXT.split(' '):
+                time.sleep(LLM_PER_OUTPUT_TOKEN)
+                yield SimpleNamespace(type="response.output_text.delta", delta=word + ' ')
+        yield SimpleNamespace(type="response.completed", response=SimpleNamespace(id=response_id))
+
+
+def fake_memories(query):
+    time.sleep(MEMORY_LATENCY)
+    return '- Prefers wines under $40'
+
+
+def fake_search_reviews(**kwargs):
+    time.sleep(DB_LATENCY)
+    return [dict(FAKE_ROW, id=index) for index in range(1, kwargs.get('top_k', 10) + 1)]
+
+
+def run_pipeline(query):
+    search_result = prepare_search(query)
+    prompt = build_prompt(
+        query=query,
+        results_text=format_results_for_prompt(search_result.results),
+        memories=search_result.memories
+    )
+    stream_response(prompt)
+
+
+def run_tools(query):
+    runner = SearchToolRunner(query)
+    stream_tool_response(build_tools_prompt(query), [SEARCH_TOOL], runner.run)
+
+
+def bench(name, answer, llm):
+    llm.reset()
+    latencies = []
+    for query in BENCH_QUERIES:
+        start = time.perf_counter()
+        answer(query)
+        latencies.append(time.perf_counter() - start)
+
+    runs = len(BENCH_QUERIES)
+    cost = (llm.input_tokens * INPUT_PRICE + llm.output_tokens * OUTPUT_PRICE) / 1_000_000
+    print(
+        f"{name:<9} median {statistics.median(latencies) * 1000:6.0f}ms"
+        f"  LLM calls/query {llm.llm_calls / runs:.1f}"
+        f"  tokens/query in {llm.input_tokens / runs:5.0f} out {llm.output_tokens / runs:4.0f}"
+        f"  cost/1k queries ${cost / runs * 1000:.3f}"
+    )
+
+
+if __name__ == "__main__":
+    llm = FakeLLM()
+    set_llm_client(llm)
+
+    # Offline stand-ins for Mem0 and Postgres; caches start empty so every query does the work
+    core.search.get_relevant_memories = fake_memories
+    core.tools.get_relevant_memories = fake_memories
+    core.search.search_reviews = fake_search_reviews
+    core.search.result_cache = SemanticResultCache(threshold=2.0)
+    cli.streaming.response_cache = ResponseCache(Path(tempfile.mkdtemp()) / 'responses.sqlite3')
+    console.file = io.StringIO()
+
+    bench("pipeline", run_pipeline, llm)
+    bench("tools", run_tools, llm)
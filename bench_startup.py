@@ -0,0 +1,76 @@
+"""
+Benchmark CLI startup: import time of cli.main and time until the prompt appears.
+
+Usage: python bench_startup.py [runs]
+"""
+import os
+import select
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).parent
+PROMPT = b"You:"
+PROMPT_TIMEOUT = 30
+
+IMPORT_SNIPPET = (
+    "import time; start = time.perf_counter(); "
+    "import cli.main; "
+    "print(time.perf_counter() - start)"
+)
+
+
+def measure_import():
+    """Seconds spent importing cli.main in a fresh interpreter."""
+    output = subprocess.run(
+        [sys.executable, "-c", IMPORT_SNIPPET],
+        cwd=ROOT,
+        capture_output=True,
+        check=True,
+        text=True
+    ).stdout
+    return float(output.strip().splitlines()[-1])
+
+
+def measure_time_to_prompt():
+    """Seconds from launching the CLI until the input prompt is printed."""
+    env = {**os.environ, "PYTHONUNBUFFERED": "1"}
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, str(ROOT / "cli" / "main.py")],
+        cwd=ROOT,
+        env=env,
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL
+    )
+    output = b""
+    try:
+        while PROMPT not in output:
+            remaining = PROMPT_TIMEOUT - (time.perf_counter() - start)
+            ready, _, _ = select.select([process.stdout], [], [], max(remaining, 0))
+            if not ready:
+                raise TimeoutError("CLI did not show a prompt")
+            chunk = os.read(process.stdout.fileno(), 4096)
+            if not chunk:
+                raise RuntimeError("CLI exited before showing a prompt")
+            output += chunk
+        return time.perf_counter() - start
+    finally:
+        process.stdin.close()
+        process.wait(timeout=PROMPT_TIMEOUT)
+
+
+def report(name, samples):
+    print(
+        f"{name:<16} median {statistics.median(samples) * 1000:7.0f}ms"
+        f"  min {min(samples) * 1000:7.0f}ms  max {max(samples) * 1000:7.0f}ms"
+    )
+
+
+if __name__ == "__main__":
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    report("Import", [measure_import() for _ in range(runs)])
+    report("Time to prompt", [measure_time_to_prompt() for _ in range(runs)])
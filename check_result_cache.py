@@ -0,0 +1,89 @@
+"""
+Offline checks for SemanticResultCache: similarity threshold, filter matching,
+TTL expiry, LRU eviction and invalidation when the reviews version changes.
+
+Usage: python check_result_cache.py
+"""
+import time
+
+from core.result_cache import SemanticResultCache
+
+ROWS = [{'id': 1, 'title': 'Example Cellars 2015 Pinot Noir'}]
+OTHER_ROWS = [{'id': 2, 'title': 'Other Estate 2016 Chardonnay'}]
+FILTERS = {'max_price': 25, 'top_k': 10}
+
+
+def check_threshold():
+    cache = SemanticResultCache(threshold=0.9)
+    cache.put([1.0, 0.0], FILTERS, ROWS)
+    assert cache.get([0.99, 0.05], FILTERS) == (ROWS, [1.0, 0.0]), "paraphrase should hit"
+    assert cache.get([0.0, 1.0], FILTERS) is None, "different query should miss"
+
+
+def check_ranking_embedding():
+    cache = SemanticResultCache(threshold=0.9)
+    cache.put([1.0, 0.0], FILTERS, ROWS, query_embedding=[0.6, 0.8])
+    assert cache.get([1.0, 0.0], FILTERS) == (ROWS, [0.6, 0.8]), "hit should return ranking embedding"
+
+
+def check_filter_mismatch():
+    cache = SemanticResultCache(threshold=0.9)
+    cache.put([1.0, 0.0], FILTERS, ROWS)
+    assert cache.get([1.0, 0.0], {**FILTERS, 'max_price': 30}) is None, "other filters should miss"
+    assert cache.get([1.0, 0.0], {**FILTERS, 'context': 'abc'}) is None, "extra filter should miss"
+
+
+def check_ttl():
+    cache = SemanticResultCache(threshold=0.9, ttl=0.05)
+    cache.put([1.0, 0.0], FILTERS, ROWS)
+    assert cache.get([1.0, 0.0], FILTERS) is not None, "fresh entry should hit"
+    time.sleep(0.1)
+    assert cache.get([1.0, 0.0], FILTERS) is None, "expired entry should miss"
+    assert cache.stats()['entries'] == 0, "expired entry should be dropped"
+
+
+def check_lru_eviction():
+    cache = SemanticResultCache(threshold=0.9, max_entries=2)
+    cache.put([1.0, 0.0, 0.0], FILTERS, ROWS)
+    cache.put([0.0, 1.0, 0.0], FILTERS, OTHER_ROWS)
+    # Touch the first entry so the second is least recently used
+    assert cache.get([1.0, 0.0, 0.0], FILTERS) is not None
+    cache.put([0.0, 0.0, 1.0], FILTERS, ROWS)
+    assert cache.get([1.0, 0.0, 0.0], FILTERS) is not None, "recently used entry should stay"
+    assert cache.get([0.0, 1.0, 0.0], FILTERS) is None, "least recently used entry should go"
+    assert cache.stats()['entries'] == 2
+
+
+def check_version_change():
+    versions = [1]
+    cache = SemanticResultCache(threshold=0.9, version_fn=lambda: versions[0], version_check_interval=0)
+    cache.put([1.0, 0.0], FILTERS, ROWS)
+    assert cache.get([1.0, 0.0], FILTERS) is not None, "unchanged version should keep entries"
+    versions[0] = 2
+    assert cache.get([1.0, 0.0], FILTERS) is None, "new version should clear entries"
+
+
+def check_version_error():
+    def failing_version():
+        raise ConnectionError("database down")
+
+    cache = SemanticResultCache(threshold=0.9, version_fn=failing_version, version_check_interval=0)
+    cache.put([1.0, 0.0], FILTERS, ROWS)
+    assert cache.get([1.0, 0.0], FILTERS) is None, "unknown version should not serve entries"
+
+
+CHECKS = [
+    check_threshold,
+    check_ranking_embedding,
+    check_filter_mismatch,
+    check_ttl,
+    check_lru_eviction,
+    check_version_change,
+    check_version_error,
+]
+
+
+if __name__ == "__main__":
+    for check in CHECKS:
+        check()
+        print(f"ok  {check.__name__}")
@@ -1,5 +1,6 @@
 from rich.console import Console
 from rich.panel import Panel
+from rich.table import Table
 from rich.text import Text
 
 from config import COLORS
@@ -17,6 +18,10 @@ def print_welcome():
     welcome_text.append("  /quit, /exit  - Exit the application\n")
     welcome_text.append("  /clear        - Clear conversation history\n")
     welcome_text.append("  /memories     - Show stored preferences\n")
+    welcome_text.append("  /more         - Show more results for the last search\n")
+    welcome_text.append("  /stats        - Show performance stats\n")
+    welcome_text.append("  /slowlog      - Show slow queries grouped by filter shape and plan\n")
+    welcome_text.append("  /explain      - Toggle EXPLAIN capture for every slow query\n")
     welcome_text.append("  /help         - Show this message\n")
 
     console.print(Panel(welcome_text, border_style="dim"))
@@ -38,10 +43,10 @@ def print_error(message: str):
     console.print(f"[{COLORS['error']}]Error: {message}[/{COLORS['error']}]")
 
 
-def print_timing(timings: dict):
+def print_timing(timings: dict, degraded: list[str] | None = None):
     """Print timing information as a formatted string."""
     parts = []
-    order = ['Memory', 'Classification', 'Image', 'Embedding', 'DB']
+    order = ['Memory', 'Classification', 'Image', 'Embedding', 'Cache', 'DB']
 
     for key in order:
         if key in timings:
@@ -50,10 +55,53 @@ def print_timing(timings: dict):
     if 'Total' in timings:
         parts.append(f"Total: {format_duration(timings['Total'])}")
 
+    if 'Response' in timings:
+        parts.append(f"Response: {format_duration(timings['Response'])}")
+
+    if 'Saved' in timings:
+        parts.append(f"Cached response, saved: {format_duration(timings['Saved'])}")
+
+    if degraded:
+        parts.append(f"Skipped: {', '.join(degraded)}")
+
     timing_str = " | ".join(parts)
     console.print(f"[{COLORS['timing']}]{timing_str}[/{COLORS['timing']}]")
 
 
+def print_stats(stats: dict):
+    """Print grouped performance counters."""
+    for group, values in stats.items():
+        parts = []
+        for key, value in values.items():
+            if isinstance(value, float):
+                value = f'{value:.2f}'
+            parts.append(f"{key}: {value}")
+        console.print(f"[bold]{group}[/bold] [{COLORS['timing']}]{' | '.join(parts)}[/{COLORS['timing']}]")
+
+
+def print_slow_query_report(report: list[dict]):
+    """Print slow and canceled queries grouped by filter shape and plan type."""
+    if not report:
+        console.print("[dim]No slow queries logged.[/dim]")
+        return
+
+    table = Table(border_style="dim")
+    for column in ('Mode', 'Filters', 'Paged', 'Plan', 'Count', 'Canceled', 'Avg', 'Max'):
+        table.add_column(column)
+    for row in report:
+        table.add_row(
+            row['mode'],
+            ', '.join(row['filters']) or '-',
+            'yes' if row['paged'] else 'no',
+            row['plan_type'],
+            str(row['count']),
+            str(row['canceled']),
+            format_duration(row['avg_ms'] / 1000),
+            format_duration(row['max_ms'] / 1000),
+        )
+    console.print(table)
+
+
 def format_duration(seconds: float) -> str:
     """Format duration in appropriate units."""
     if seconds >= 1:
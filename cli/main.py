@@ -4,11 +4,9 @@ from pathlib import Path
 # Add project root to Python path for imports
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import Future, ThreadPoolExecutor
 
-from dotenv import load_dotenv
-
-from config import MAX_HISTORY_MESSAGES
+from config import MAX_HISTORY_MESSAGES, ANSWER_MODE
 from cli.console import (
     console,
     print_welcome,
@@ -16,12 +14,30 @@ from cli.console import (
     print_assistant_start,
     print_error,
     print_timing,
+    print_stats,
+    print_slow_query_report,
 )
 from cli.url_extractor import extract_image_urls
-from cli.streaming import stream_response, build_prompt
-from core.search import prepare_search, format_results_for_prompt
-from core.memory import store_interaction, get_all_memories
-from database_helper import init_pool
+from cli.streaming import (
+    stream_response,
+    stream_tool_response,
+    build_prompt,
+    build_tools_prompt,
+    response_cache,
+)
+from core.search import (
+    prepare_search,
+    format_results_for_prompt,
+    format_facets_for_prompt,
+    get_search_stats,
+    fetch_more,
+    SearchResult,
+)
+from core.clients import get_llm_client, get_memory_client
+from core.tools import SEARCH_TOOL, SearchToolRunner
+from core.memory import store_interaction, get_all_memories, get_relevant_memories
+from database_helper import slow_query_report, capture_plans
+from db_pool import init_pool, get_pool_stats
 
 
 class ConversationHistory:
@@ -54,11 +70,22 @@ class ConversationHistory:
         self.exchanges = []
 
 
+def warm_up_clients():
+    """Create network clients and make a first memory fetch so the first query doesn't pay for them."""
+    get_llm_client()
+    get_memory_client()
+    get_relevant_memories('wine preferences')
+
+
 class WineChatbot:
     """Main chatbot class handling the CLI chatloop."""
 
-    def __init__(self):
+    def __init__(self, pool_ready: Future | None = None):
         self.history = ConversationHistory()
+        self.pool_ready = pool_ready
+        self.last_query: str | None = None
+        self.last_search: SearchResult | None = None
+        self.explain_slow_queries = False
 
     def handle_command(self, command: str) -> bool:
         """
@@ -88,6 +115,29 @@ class WineChatbot:
                 console.print("[dim]No stored memories found.[/dim]")
             return True
 
+        if cmd == '/more':
+            self.show_more()
+            return True
+
+        if cmd == '/stats':
+            print_stats({
+                **get_search_stats(),
+                'Response cache': response_cache.stats(),
+                **get_pool_stats(),
+            })
+            return True
+
+        if cmd == '/slowlog':
+            print_slow_query_report(slow_query_report())
+            return True
+
+        if cmd == '/explain':
+            self.explain_slow_queries = not self.explain_slow_queries
+            capture_plans(self.explain_slow_queries)
+            state = 'on' if self.explain_slow_queries else 'off (sampled)'
+            console.print(f"[dim]EXPLAIN capture for slow queries: {state}[/dim]")
+            return True
+
         if cmd == '/help':
             print_welcome()
             return True
@@ -103,6 +153,14 @@ class WineChatbot:
             print_error("Please enter a search query.")
             return
 
+        if not self.wait_for_pool():
+            return
+
+        # Tool-calling mode lets the answering model run the search itself
+        if ANSWER_MODE == 'tools' and not image_urls:
+            self.respond_with_tools(cleaned_query)
+            return
+
         # Run search with parallel operations
         try:
             search_result = prepare_search(
@@ -113,12 +171,65 @@ class WineChatbot:
             print_error(f"Search failed: {e}")
             return
 
+        self.last_query = cleaned_query
+        self.last_search = search_result
+        self.respond(cleaned_query, search_result, remember=True)
+
+    def wait_for_pool(self) -> bool:
+        """
+        Wait for the background pool warmup started in main().
+
+        If it failed (e.g. Postgres was down at launch), try again now, so the
+        session recovers once the database is back.
+        """
+        if self.pool_ready is None:
+            return True
+        try:
+            self.pool_ready.result()
+            return True
+        except Exception:
+            pass
+
+        self.pool_ready = Future()
+        try:
+            init_pool()
+        except Exception as e:
+            self.pool_ready.set_exception(e)
+            print_error(f"Database unavailable: {e}")
+            return False
+        self.pool_ready.set_result(None)
+        return True
+
+    def show_more(self):
+        """Summarize the next page of the last search without re-running it."""
+        last = self.last_search
+        if last is None or last.cursor is None or last.cursor.exhausted:
+            console.print("[dim]No more results for the last search.[/dim]")
+            return
+
+        try:
+            search_result = fetch_more(last)
+        except Exception as e:
+            print_error(f"Search failed: {e}")
+            return
+
+        if not search_result.results:
+            console.print("[dim]No more results for the last search.[/dim]")
+            return
+
+        self.respond(f"{self.last_query} (more results)", search_result)
+
+    def respond(self, query: str, search_result: SearchResult, remember: bool = False):
+        """Stream an answer for the search results and record the exchange."""
         # Format results for prompt
-        results_text = format_results_for_prompt(search_result.results)
+        results_text = '\n\n'.join(filter(None, [
+            format_facets_for_prompt(search_result.facets),
+            format_results_for_prompt(search_result.results),
+        ]))
 
         # Build prompt with all context
         prompt = build_prompt(
-            query=cleaned_query,
+            query=query,
             results_text=results_text,
             memories=search_result.memories,
             image_description=search_result.image_description,
@@ -128,7 +239,7 @@ class WineChatbot:
         # Stream response
         print_assistant_start()
         try:
-            response = stream_response(prompt)
+            response = stream_response(prompt, search_result.timings)
         except Exception as e:
             console.print()  # Newline after assistant label
             print_error(f"Failed to generate response: {e}")
@@ -137,19 +248,52 @@ class WineChatbot:
         console.print()  # Newline after streamed response
 
         # Print timing
-        print_timing(search_result.timings)
+        print_timing(search_result.timings, search_result.degraded)
+        console.print()
+
+        self.record_exchange(query, response, search_result.image_description, remember)
+
+    def respond_with_tools(self, query: str):
+        """Answer in one conversation where the model calls the search tool itself."""
+        runner = SearchToolRunner(query)
+        prompt = build_tools_prompt(query, self.history.get_context_string())
+
+        print_assistant_start()
+        try:
+            response = stream_tool_response(prompt, [SEARCH_TOOL], runner.run, runner.timings)
+        except Exception as e:
+            console.print()  # Newline after assistant label
+            print_error(f"Failed to generate response: {e}")
+            return
+
+        console.print()  # Newline after streamed response
+
+        print_timing(runner.timings, runner.degraded)
         console.print()
 
+        # Keep the previous search for /more if the model answered from history
+        if runner.search_result is not None:
+            self.last_query = query
+            self.last_search = runner.search_result
+
+        self.record_exchange(query, response, remember=True)
+
+    def record_exchange(self, query: str, response: str, image_description: str | None = None,
+                        remember: bool = False):
+        """Add the exchange to history and, if remember is set, store it in Mem0."""
         # Update conversation history
-        self.history.add_exchange(cleaned_query, response)
+        self.history.add_exchange(query, response)
+
+        if not remember:
+            return
 
         # Store in Mem0 (background)
         executor = ThreadPoolExecutor(max_workers=1)
         executor.submit(
             store_interaction,
-            cleaned_query,
+            query,
             response,
-            search_result.image_description
+            image_description
         )
         executor.shutdown(wait=False)
 
@@ -172,7 +316,7 @@ class WineChatbot:
                 if not self.handle_command(user_input):
                     break
                 # If it was a recognized command, continue
-                if user_input.lower() in ('/quit', '/exit', '/clear', '/memories', '/help'):
+                if user_input.lower() in ('/quit', '/exit', '/clear', '/memories', '/more', '/stats', '/slowlog', '/explain', '/help'):
                     continue
 
             # Process as query
@@ -181,10 +325,16 @@ class WineChatbot:
 
 def main():
     """Entry point for the CLI application."""
-    load_dotenv()
-    init_pool()
-
-    chatbot = WineChatbot()
+    # Warm up the DB pool and clients while the welcome banner shows
+    executor = ThreadPoolExecutor(max_workers=2)
+    pool_ready = executor.submit(init_pool)
+    # Failures here resurface on the first real call, so the result is ignored
+    executor.submit(warm_up_clients)
+    executor.shutdown(wait=False)
+
+    chatbot = WineChatbot(pool_ready=pool_ready)
     chatbot.run()
 
-main()
\ No newline at end of file
+
+if __name__ == '__main__':
+    main()
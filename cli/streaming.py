@@ -1,35 +1,168 @@
-from dotenv import load_dotenv
-from openai import OpenAI
+import time
+
 from rich.live import Live
 from rich.text import Text
 
-from config import LLM_MODEL, COLORS
+from config import (
+    LLM_MODEL,
+    COLORS,
+    MAX_TOOL_ROUNDS,
+    RESPONSE_CACHE_PATH,
+    RESPONSE_CACHE_MAX_ENTRIES,
+    RESPONSE_CACHE_MAX_DISK_ENTRIES,
+)
 from cli.console import console
+from core.clients import get_llm_client
+from core.response_cache import ResponseCache
+
+SUMMARY_INSTRUCTIONS = (
+    "Summarize the results based on the user query and memory context. Include relevant details like variety, location, reviewer/taster name, price, and points. If memory indicates user preferences (e.g., wanting taster names), ensure those are included in your response."
+)
+
+response_cache = ResponseCache(
+    RESPONSE_CACHE_PATH,
+    max_entries=RESPONSE_CACHE_MAX_ENTRIES,
+    max_disk_entries=RESPONSE_CACHE_MAX_DISK_ENTRIES
+)
 
-load_dotenv()
-llm_client = OpenAI()
 
+def _replay(text: str):
+    """Yield a cached response as text deltas, word by word."""
+    start = 0
+    while start < len(text):
+        end = text.find(' ', start + 1)
+        end = len(text) if end == -1 else end
+        yield text[start:end]
+        start = end
 
-def stream_response(prompt: str) -> str:
+
+def stream_response(prompt: str, timings: dict | None = None) -> str:
     """
     Stream LLM response to console using Rich Live.
 
+    An identical prompt seen before is replayed from the response cache
+    through the same rendering path, with no network call. Only responses
+    that completed are stored. Generation time,
+    and on a hit the time saved, are added to timings.
+
     Returns the full response text.
     """
     full_response = ""
-
-    stream = llm_client.responses.create(
-        model=LLM_MODEL,
-        input=prompt,
-        stream=True
-    )
+    completed = False
+    key = response_cache.key(LLM_MODEL, prompt)
+    cached = response_cache.get(key)
+    start = time.perf_counter()
 
     with Live(Text("", style=COLORS['assistant']), console=console, refresh_per_second=15) as live:
-        for event in stream:
-            if event.type == "response.output_text.delta":
-                full_response += event.delta
+        if cached is not None:
+            for delta in _replay(cached.text):
+                full_response += delta
                 live.update(Text(full_response, style=COLORS['assistant']))
+        else:
+            stream = get_llm_client().responses.create(
+                model=LLM_MODEL,
+                input=prompt,
+                stream=True
+            )
+            for event in stream:
+                if event.type == "response.output_text.delta":
+                    full_response += event.delta
+                    live.update(Text(full_response, style=COLORS['assistant']))
+                elif event.type == "response.completed":
+                    completed = True
+
+    elapsed = time.perf_counter() - start
+    if cached is not None:
+        response_cache.record_saved(cached.generation_seconds - elapsed)
+    elif completed and full_response:
+        # Truncated (response.incomplete) or failed answers are not replayed
+        response_cache.put(key, full_response, elapsed)
+
+    if timings is not None:
+        timings['Response'] = elapsed
+        if cached is not None:
+            timings['Saved'] = max(cached.generation_seconds - elapsed, 0.0)
+
+    return full_response
+
+
+def stream_tool_response(prompt: str, tools: list[dict], run_tool, timings: dict | None = None) -> str:
+    """
+    Stream an LLM response that may call tools, in a single conversation.
 
+    Tool calls are executed with run_tool(name, arguments) and their output is
+    sent back on the same response chain, so the answer streams from there.
+    That answer is cached on the prompt plus every tool output, as
+    stream_response caches on a prompt that includes the results; a hit
+    replays it instead of making the final model call. The final round's
+    time, and on a hit the time saved, are added to timings.
+
+    Returns the full response text.
+    """
+    full_response = ""
+    request = {'input': prompt}
+    tool_outputs = []
+    cache_key = None
+
+    with Live(Text("", style=COLORS['assistant']), console=console, refresh_per_second=15) as live:
+        for round_number in range(MAX_TOOL_ROUNDS + 1):
+            round_start = time.perf_counter()
+            stream = get_llm_client().responses.create(
+                model=LLM_MODEL,
+                tools=tools,
+                # Last round must answer with what it has
+                tool_choice='auto' if round_number < MAX_TOOL_ROUNDS else 'none',
+                stream=True,
+                **request
+            )
+
+            calls = []
+            response_id = None
+            round_text = ""
+            for event in stream:
+                if event.type == "response.output_text.delta":
+                    full_response += event.delta
+                    round_text += event.delta
+                    live.update(Text(full_response, style=COLORS['assistant']))
+                elif event.type == "response.output_item.done" and event.item.type == "function_call":
+                    calls.append(event.item)
+                elif event.type == "response.completed":
+                    response_id = event.response.id
+            elapsed = time.perf_counter() - round_start
+
+            if not calls:
+                # Only answers that completed are cached
+                if cache_key is not None and response_id is not None and round_text:
+                    response_cache.put(cache_key, round_text, elapsed)
+                break
+
+            outputs = [
+                {
+                    'type': 'function_call_output',
+                    'call_id': call.call_id,
+                    'output': run_tool(call.name, call.arguments)
+                }
+                for call in calls
+            ]
+            tool_outputs.extend(output['output'] for output in outputs)
+            cache_key = response_cache.key(LLM_MODEL, '\0'.join([prompt] + tool_outputs))
+
+            cached = response_cache.get(cache_key)
+            if cached is not None:
+                round_start = time.perf_counter()
+                for delta in _replay(cached.text):
+                    full_response += delta
+                    live.update(Text(full_response, style=COLORS['assistant']))
+                elapsed = time.perf_counter() - round_start
+                response_cache.record_saved(cached.generation_seconds - elapsed)
+                if timings is not None:
+                    timings['Saved'] = max(cached.generation_seconds - elapsed, 0.0)
+                break
+
+            request = {'previous_response_id': response_id, 'input': outputs}
+
+    if timings is not None:
+        timings['Response'] = elapsed
     return full_response
 
 
@@ -72,5 +205,17 @@ def build_prompt(
         f"{context_text}"
         f"## User Query\n{query}\n\n"
         f"## Search Results\n{results_text}\n\n"
-        "Summarize the results based on the user query and memory context. Include relevant details like variety, location, reviewer/taster name, price, and points. If memory indicates user preferences (e.g., wanting taster names), ensure those are included in your response."
+        f"{SUMMARY_INSTRUCTIONS}"
+    )
+
+
+def build_tools_prompt(query: str, conversation_history: str = '') -> str:
+    """Build the prompt for tool-calling mode, where the model runs the search itself."""
+    context_text = f'## Conversation History\n{conversation_history}\n\n' if conversation_history else ''
+    return (
+        f"{context_text}"
+        f"## User Query\n{query}\n\n"
+        "Call the search_reviews tool to find wines for this query, unless the conversation history "
+        "already answers it. If the search finds nothing, say no close matches were found and suggest "
+        f"trying different keywords. Otherwise: {SUMMARY_INSTRUCTIONS}"
     )
@@ -3,6 +3,50 @@ EMBEDDING_MODEL = 'text-embedding-3-small'
 LLM_MODEL = 'gpt-4.1-nano'
 VISION_MODEL = 'gpt-4.1-mini'
 
+# Request coalescing: how long to hold calls so concurrent ones share a request
+COALESCE_WINDOW_SECONDS = 0.01
+EMBEDDING_BATCH_SIZE = 64
+
+# Semantic result cache: paraphrased queries with identical filters reuse results.
+# Keyed on the bare query's embedding. Off until a tune_cache_threshold.py run
+# is recorded in cache_threshold_runs.jsonl and the threshold is set from it;
+# a threshold that is too low serves another query's wines.
+RESULT_CACHE_ENABLED = False
+RESULT_CACHE_THRESHOLD = 0.92
+RESULT_CACHE_MAX_ENTRIES = 256
+RESULT_CACHE_TTL_SECONDS = 3600
+RESULT_CACHE_VERSION_CHECK_SECONDS = 30
+
+# Latency budget for prepare_search (seconds). Stages that miss their deadline
+# are skipped so one slow service can't hold up the answer. A late embedding
+# falls back to a lexical or keyword search.
+SEARCH_BUDGET_SECONDS = 8.0
+STAGE_DEADLINES = {
+    'Image': 4.0,
+    'Memory': 1.5,
+    'Classification': 2.5,
+    'Embedding': 2.0,
+}
+# Calls per stage that may still be running (e.g. past their deadline) before
+# new ones are skipped instead of queued
+STAGE_MAX_OUTSTANDING = 4
+
+# Answer mode: 'pipeline' classifies, searches, then summarizes in a separate call.
+# 'tools' gives the answering model a search_reviews tool so it fills in the
+# filters itself and the answer streams back in the same conversation.
+# It is ~9% faster in bench_answer_modes.py but resends the prompt on the
+# second turn, so it costs ~75% more input tokens per query.
+ANSWER_MODE = 'pipeline'
+MAX_TOOL_ROUNDS = 2
+# Tools mode fetches top_k * this many unfiltered candidates while the model
+# decides on filters, so most tool calls are answered without another search
+SPECULATIVE_CANDIDATE_FACTOR = 5
+
+# Response cache: identical prompts replay the stored answer instead of calling the LLM
+RESPONSE_CACHE_PATH = '.cache/responses.sqlite3'
+RESPONSE_CACHE_MAX_ENTRIES = 128
+RESPONSE_CACHE_MAX_DISK_ENTRIES = 2000
+
 # User configuration
 USER_ID = 'wine-user-1'
 
@@ -0,0 +1,37 @@
+import threading
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+_lock = threading.Lock()
+_llm_client = None
+_memory_client = None
+
+
+def get_llm_client():
+    """Shared OpenAI client, created on first use."""
+    global _llm_client
+    if _llm_client is None:
+        with _lock:
+            if _llm_client is None:
+                from openai import OpenAI
+                _llm_client = OpenAI()
+    return _llm_client
+
+
+def get_memory_client():
+    """Shared Mem0 client, created on first use."""
+    global _memory_client
+    if _memory_client is None:
+        with _lock:
+            if _memory_client is None:
+                from mem0 import MemoryClient
+                _memory_client = MemoryClient()
+    return _memory_client
+
+
+def set_llm_client(client):
+    """Replace the shared OpenAI client, e.g. with an offline fake for benchmarks."""
+    global _llm_client
+    _llm_client = client
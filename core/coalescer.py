@@ -0,0 +1,108 @@
+import threading
+from concurrent.futures import Future
+from dataclasses import dataclass
+
+
+@dataclass
+class CoalescerStats:
+    """Counters describing how well concurrent calls were grouped."""
+    requests: int = 0
+    deduplicated: int = 0
+    batches: int = 0
+    batched_items: int = 0
+
+    @property
+    def avg_batch_size(self) -> float:
+        return self.batched_items / self.batches if self.batches else 0.0
+
+    @property
+    def dedup_rate(self) -> float:
+        return self.deduplicated / self.requests if self.requests else 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            'requests': self.requests,
+            'deduplicated': self.deduplicated,
+            'batches': self.batches,
+            'avg_batch_size': self.avg_batch_size,
+            'dedup_rate': self.dedup_rate,
+        }
+
+
+class RequestCoalescer:
+    """
+    Groups concurrent calls into batches and merges identical in-flight calls.
+
+    The first caller to open a batch waits `window` seconds for others to join,
+    then sends every distinct key in one `batch_fn` call. `batch_fn` takes a list
+    of keys and returns results in the same order. Callers asking for a key that
+    is already queued or in flight wait on the existing call instead.
+    """
+
+    def __init__(self, batch_fn, window: float = 0.0, max_batch: int = 1):
+        self._batch_fn = batch_fn
+        self.window = window
+        self.max_batch = max_batch
+        self._lock = threading.Lock()
+        self._futures: dict = {}
+        self._open_batch: list | None = None
+        self.stats = CoalescerStats()
+
+    def submit(self, key):
+        """Return the result for key, sharing work with concurrent callers."""
+        return self.submit_many([key])[0]
+
+    def submit_many(self, keys: list) -> list:
+        """Return results for several keys, which join batches as separate submit() calls would."""
+        futures = []
+        led_batches = []
+        with self._lock:
+            for key in keys:
+                self.stats.requests += 1
+                future = self._futures.get(key)
+                if future is not None:
+                    self.stats.deduplicated += 1
+                else:
+                    future = Future()
+                    self._futures[key] = future
+                    if self._open_batch is None:
+                        self._open_batch = ([], threading.Event())
+                        led_batches.append(self._open_batch)
+                    batch, full = self._open_batch
+                    batch.append(key)
+                    if len(batch) >= self.max_batch:
+                        self._open_batch = None
+                        full.set()
+                futures.append(future)
+
+        for batch, full in led_batches:
+            self._run_batch(batch, full)
+        return [future.result() for future in futures]
+
+    def _run_batch(self, batch: list, full: threading.Event):
+        """Wait until the batch window closes or the batch fills, then dispatch it."""
+        if self.window > 0:
+            full.wait(self.window)
+
+        with self._lock:
+            if self._open_batch is not None and self._open_batch[0] is batch:
+                self._open_batch = None
+            keys = list(batch)
+            futures = [self._futures[key] for key in keys]
+            self.stats.batches += 1
+            self.stats.batched_items += len(keys)
+
+        try:
+            results = list(self._batch_fn(keys))
+            if len(results) != len(keys):
+                raise ValueError(f'batch_fn returned {len(results)} results for {len(keys)} keys')
+        except Exception as e:
+            for future in futures:
+                future.set_exception(e)
+        else:
+            for future, result in zip(futures, results):
+                future.set_result(result)
+        finally:
+            with self._lock:
+                for key in keys:
+                    self._futures.pop(key, None)
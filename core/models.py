@@ -5,15 +5,35 @@ from typing import Optional
 class QueryClassification(BaseModel):
     type: str = Field(
         description=(
-            "If the query mentions attributes like country, province, variety, or description, set type='semantic'. "
-            "If it only specifies filters like price, points, or a tasters' name, set type='keyword'. "
-            "If both are present, use 'semantic'."
+            "If the query mentions attributes like province, region, style, or description, set type='semantic'. "
+            "If it only specifies filters like price, points, country, variety, or a tasters' name, set type='keyword'. "
+            "If both are present, use 'semantic'. "
+            "If the query only names a specific winery or wine title (optionally with those filters), set type='lexical'."
         )
     )
+    name: Optional[str] = Field(
+        default=None,
+        description='The winery or wine title named in the query, as written (null if not mentioned).'
+    )
     taster_name: Optional[str] = Field(
         default=None,
         description='The name of the taster (null if not mentioned).'
     )
+    country: Optional[str] = Field(
+        default=None,
+        description="The country of the wine as a country name, e.g. 'US', 'France', 'Italy' (null if not mentioned)."
+    )
+    variety: Optional[str] = Field(
+        default=None,
+        description="The grape variety or blend, e.g. 'Pinot Noir', 'Red Blend' (null if not mentioned)."
+    )
+    group_by: Optional[str] = Field(
+        default=None,
+        description=(
+            "If the query asks which varieties, countries, or tasters rate highest or compares them, "
+            "the attribute to group by: 'variety', 'country', or 'taster_name' (null otherwise)."
+        )
+    )
     min_points: Optional[int] = Field(
         default=None,
         description='The minimum points that the wine should have (null if not mentioned).'
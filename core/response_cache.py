@@ -0,0 +1,128 @@
+import hashlib
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+
+
+@dataclass
+class CachedResponse:
+    text: str
+    generation_seconds: float
+
+
+class ResponseCache:
+    """
+    Two-tier cache of generated answers keyed on a hash of model and prompt.
+
+    The prompt already carries results, memories and conversation history, so
+    any change to those (e.g. /clear or a new memory) gives a new key. Recent
+    entries are kept in memory (LRU, `max_entries`); all entries are written
+    to a SQLite file trimmed to the `max_disk_entries` most recently used.
+    """
+
+    def __init__(self, path: str, max_entries: int = 128, max_disk_entries: int = 2000):
+        self.path = Path(path)
+        self.max_entries = max_entries
+        self.max_disk_entries = max_disk_entries
+        self._entries: OrderedDict[str, CachedResponse] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+
+    @staticmethod
+    def key(model: str, prompt: str) -> str:
+        return hashlib.sha256(f'{model}\0{prompt}'.encode()).hexdigest()
+
+    def get(self, key: str) -> CachedResponse | None:
+        """Return the cached response for key, checking memory then disk."""
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is not None:
+                self._entries.move_to_end(key)
+
+        if cached is None:
+            cached = self._disk_get(key)
+            if cached is not None:
+                self._remember(key, cached)
+
+        with self._lock:
+            if cached is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return cached
+
+    def put(self, key: str, text: str, generation_seconds: float):
+        """Store a generated response in both tiers."""
+        cached = CachedResponse(text=text, generation_seconds=generation_seconds)
+        self._remember(key, cached)
+        self._disk_put(key, cached)
+
+    def record_saved(self, seconds: float):
+        with self._lock:
+            self.saved_seconds += max(seconds, 0.0)
+
+    def _remember(self, key: str, cached: CachedResponse):
+        with self._lock:
+            self._entries[key] = cached
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    @contextmanager
+    def _disk(self):
+        """Open the SQLite tier for one transaction."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(self.path)
+        try:
+            with conn:
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS responses (
+                        key text PRIMARY KEY,
+                        text text NOT NULL,
+                        generation_seconds real NOT NULL,
+                        last_used real NOT NULL
+                    )
+                """)
+                yield conn
+        finally:
+            conn.close()
+
+    def _disk_get(self, key: str) -> CachedResponse | None:
+        if not self.path.exists():
+            return None
+        with self._disk() as conn:
+            row = conn.execute(
+                "SELECT text, generation_seconds FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute("UPDATE responses SET last_used = ? WHERE key = ?", (time.time(), key))
+        return CachedResponse(text=row[0], generation_seconds=row[1])
+
+    def _disk_put(self, key: str, cached: CachedResponse):
+        with self._disk() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?)",
+                (key, cached.text, cached.generation_seconds, time.time())
+            )
+            conn.execute("""
+                DELETE FROM responses WHERE key NOT IN (
+                    SELECT key FROM responses ORDER BY last_used DESC LIMIT ?
+                )
+            """, (self.max_disk_entries,))
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'saved_s': self.saved_seconds,
+        }
@@ -0,0 +1,152 @@
+import math
+import operator
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+
+@dataclass
+class _CacheEntry:
+    embedding: list[float]
+    query_embedding: list[float]
+    filters: tuple
+    results: list[dict]
+    created: float
+
+
+def _normalize(vector: list[float]) -> list[float]:
+    norm = math.sqrt(sum(v * v for v in vector))
+    return [v / norm for v in vector] if norm else list(vector)
+
+
+def _dot(a: list[float], b: list[float]) -> float:
+    return sum(map(operator.mul, a, b))
+
+
+class SemanticResultCache:
+    """
+    Caches ranked search results keyed on query embedding and filters.
+
+    A lookup hits when a cached entry has identical filters and its embedding
+    is within `threshold` cosine similarity of the new query. The key embedding
+    may differ from the one the results were ranked against (`query_embedding`),
+    which is returned on a hit so later pages follow the same ranking. Entries expire
+    after `ttl` seconds and the least recently used entry is evicted once the
+    cache holds `max_entries`. If `version_fn` is given it is polled at most
+    every `version_check_interval` seconds and the cache is cleared whenever
+    the returned data version changes.
+    """
+
+    def __init__(
+        self,
+        threshold: float = 0.92,
+        max_entries: int = 256,
+        ttl: float = 3600,
+        version_fn=None,
+        version_check_interval: float = 30
+    ):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._version_fn = version_fn
+        self._version_check_interval = version_check_interval
+        self._version = None
+        self._version_checked = 0.0
+        self._entries: OrderedDict[int, _CacheEntry] = OrderedDict()
+        self._next_key = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _filters_key(filters: dict) -> tuple:
+        return tuple(sorted(filters.items()))
+
+    def get(self, embedding: list[float], filters: dict) -> tuple[list[dict], list[float]] | None:
+        """
+        Look up results for a similar query with the same filters.
+
+        Returns (results, embedding the results were ranked against), or None.
+        """
+        self._check_version()
+        query = _normalize(embedding)
+        filters_key = self._filters_key(filters)
+        now = time.monotonic()
+
+        with self._lock:
+            best_key, best_score = None, self.threshold
+            for key, entry in list(self._entries.items()):
+                if now - entry.created > self.ttl:
+                    del self._entries[key]
+                    continue
+                if entry.filters != filters_key:
+                    continue
+                score = _dot(query, entry.embedding)
+                if score >= best_score:
+                    best_key, best_score = key, score
+
+            if best_key is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            self._entries.move_to_end(best_key)
+            entry = self._entries[best_key]
+            return list(entry.results), entry.query_embedding
+
+    def put(
+        self,
+        embedding: list[float],
+        filters: dict,
+        results: list[dict],
+        query_embedding: list[float] | None = None
+    ):
+        """Store results keyed on a query embedding and its filters."""
+        self._check_version()
+        entry = _CacheEntry(
+            embedding=_normalize(embedding),
+            query_embedding=list(query_embedding if query_embedding is not None else embedding),
+            filters=self._filters_key(filters),
+            results=list(results),
+            created=time.monotonic()
+        )
+        with self._lock:
+            self._entries[self._next_key] = entry
+            self._next_key += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self):
+        """Drop all cached results."""
+        with self._lock:
+            self._entries.clear()
+
+    def _check_version(self):
+        if self._version_fn is None:
+            return
+        now = time.monotonic()
+        if now - self._version_checked < self._version_check_interval:
+            return
+        self._version_checked = now
+        try:
+            version = self._version_fn()
+        except Exception:
+            # Can't tell whether reviews changed, so don't trust what we have
+            version = None
+        if version is None or version != self._version:
+            self.invalidate()
+        self._version = version
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats(self) -> dict:
+        return {
+            'entries': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hit_rate,
+        }
@@ -1,17 +1,54 @@
+import hashlib
+import threading
 import time
-from concurrent.futures import ThreadPoolExecutor
+from collections import Counter
+from concurrent.futures import Future, ThreadPoolExecutor
 from dataclasses import dataclass, field
 
-from dotenv import load_dotenv
-from openai import OpenAI
-
-from config import EMBEDDING_MODEL, LLM_MODEL, VISION_MODEL
+from config import (
+    EMBEDDING_MODEL,
+    LLM_MODEL,
+    VISION_MODEL,
+    COALESCE_WINDOW_SECONDS,
+    EMBEDDING_BATCH_SIZE,
+    RESULT_CACHE_ENABLED,
+    RESULT_CACHE_THRESHOLD,
+    RESULT_CACHE_MAX_ENTRIES,
+    RESULT_CACHE_TTL_SECONDS,
+    RESULT_CACHE_VERSION_CHECK_SECONDS,
+    SEARCH_BUDGET_SECONDS,
+    STAGE_DEADLINES,
+    STAGE_MAX_OUTSTANDING,
+    SPECULATIVE_CANDIDATE_FACTOR,
+)
+from core.clients import get_llm_client
+from core.coalescer import RequestCoalescer
 from core.models import QueryClassification
 from core.memory import get_relevant_memories
-from database_helper import search_reviews
+from core.result_cache import SemanticResultCache
+from database_helper import search_reviews, get_facet_stats, get_reviews_version, resolve_facet_value
 
-load_dotenv()
-llm_client = OpenAI()
+
+@dataclass
+class SearchCursor:
+    """Where a ranked search left off, so later pages reuse its embedding and filters."""
+    filters: dict
+    query_embedding: list[float] | None = None
+    text_query: str | None = None
+    min_similarity: float = 0.05
+    after: tuple | None = None
+    offset: int = 0
+    exhausted: bool = False
+
+
+@dataclass
+class SpeculativeSearch:
+    """Unfiltered vector candidates fetched before the query was classified."""
+    search_text: str
+    embedding: list[float]
+    candidates: list[dict]
+    limit: int
+    min_similarity: float
 
 
 @dataclass
@@ -22,11 +59,13 @@ class SearchResult:
     image_description: str | None
     classification: QueryClassification
     timings: dict = field(default_factory=dict)
+    facets: list[dict] = field(default_factory=list)
+    degraded: list[str] = field(default_factory=list)
+    cursor: SearchCursor | None = None
 
 
-def classify_query(query: str) -> QueryClassification:
-    """Classify the query to determine search type and extract filters."""
-    response = llm_client.responses.parse(
+def _classify_one(query: str) -> QueryClassification:
+    response = get_llm_client().responses.parse(
         model=LLM_MODEL,
         input=[
             {
@@ -35,14 +74,63 @@ def classify_query(query: str) -> QueryClassification:
             },
             {'role': 'user', 'content': query}
         ],
-        text_format=QueryClassification
+        text_format=QueryClassification,
+        timeout=STAGE_DEADLINES['Classification']
     )
     return response.output_parsed
 
 
+def _classify_batch(queries: list[str]) -> list[QueryClassification]:
+    return [_classify_one(query) for query in queries]
+
+
+def _embed_batch(texts: list[str]) -> list[list[float]]:
+    resp = get_llm_client().embeddings.create(
+        model=EMBEDDING_MODEL,
+        input=texts,
+        timeout=STAGE_DEADLINES['Embedding']
+    )
+    return [item.embedding for item in sorted(resp.data, key=lambda item: item.index)]
+
+
+# Classification has no batch endpoint, so it only merges identical in-flight queries.
+_classify_coalescer = RequestCoalescer(_classify_batch)
+_embedding_coalescer = RequestCoalescer(
+    _embed_batch,
+    window=COALESCE_WINDOW_SECONDS,
+    max_batch=EMBEDDING_BATCH_SIZE
+)
+
+# One executor per stage, so calls that hang in one service can't take the
+# threads of another. Stages that overrun their deadline finish in the
+# background; past STAGE_MAX_OUTSTANDING running calls a stage is skipped.
+_BACKGROUND_STAGES = ('Classification', 'Image', 'Memory', 'Speculative')
+_stage_executors = {
+    name: ThreadPoolExecutor(max_workers=STAGE_MAX_OUTSTANDING, thread_name_prefix=f'stage-{name}')
+    for name in _BACKGROUND_STAGES
+}
+_stage_slots = {name: threading.BoundedSemaphore(STAGE_MAX_OUTSTANDING) for name in _BACKGROUND_STAGES}
+_stats_lock = threading.Lock()
+_searches = 0
+_degraded_stages = Counter()
+
+result_cache = SemanticResultCache(
+    threshold=RESULT_CACHE_THRESHOLD,
+    max_entries=RESULT_CACHE_MAX_ENTRIES,
+    ttl=RESULT_CACHE_TTL_SECONDS,
+    version_fn=get_reviews_version,
+    version_check_interval=RESULT_CACHE_VERSION_CHECK_SECONDS
+)
+
+
+def classify_query(query: str) -> QueryClassification:
+    """Classify the query to determine search type and extract filters."""
+    return _classify_coalescer.submit(query)
+
+
 def describe_image(image_url: str) -> str:
     """Use vision LLM to describe a wine image."""
-    response = llm_client.responses.create(
+    response = get_llm_client().responses.create(
         model=VISION_MODEL,
         input=[
             {
@@ -56,15 +144,78 @@ def describe_image(image_url: str) -> str:
                 ]
             }
         ],
-        max_output_tokens=150
+        max_output_tokens=150,
+        timeout=STAGE_DEADLINES['Image']
     )
     return response.output_text.strip()
 
 
 def embed_query(text: str) -> list[float]:
-    """Generate embedding for the query text."""
-    resp = llm_client.embeddings.create(model=EMBEDDING_MODEL, input=text)
-    return resp.data[0].embedding
+    """Generate embedding for the query text, batched with concurrent callers."""
+    return _embedding_coalescer.submit(text)
+
+
+def embed_queries(texts: list[str]) -> list[list[float]]:
+    """Generate embeddings for several texts, batched together and with concurrent callers."""
+    return _embedding_coalescer.submit_many(texts)
+
+
+def get_search_stats() -> dict:
+    """Batching, dedup and result cache counters for the search pipeline."""
+    with _stats_lock:
+        degraded = {'searches': _searches, **_degraded_stages}
+    return {
+        'Embedding': _embedding_coalescer.stats.as_dict(),
+        'Classification': _classify_coalescer.stats.as_dict(),
+        'Result cache': result_cache.stats(),
+        'Degraded': degraded,
+    }
+
+
+def _timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def start_stage(name, fn, *args) -> Future:
+    """
+    Run a pipeline stage in the background; collect it with stage_result().
+
+    If the stage already has STAGE_MAX_OUTSTANDING calls running (e.g. its
+    service hangs), the returned future has failed and the stage degrades.
+    """
+    slots = _stage_slots[name]
+    if not slots.acquire(blocking=False):
+        future = Future()
+        future.set_exception(RuntimeError(f'{name}: too many calls still running'))
+        return future
+    future = _stage_executors[name].submit(_timed, fn, *args)
+    future.add_done_callback(lambda _: slots.release())
+    return future
+
+
+def _record_degraded(name, degraded):
+    degraded.append(name)
+    with _stats_lock:
+        _degraded_stages[name] += 1
+
+
+def stage_result(name, future, started, deadline, timings, degraded, fallback):
+    """
+    Wait for a stage until its own deadline or the overall deadline, whichever is first.
+
+    A stage that runs late or fails is recorded as degraded and replaced by fallback.
+    """
+    stage_deadline = min(started + STAGE_DEADLINES[name], deadline)
+    try:
+        result, elapsed = future.result(timeout=max(stage_deadline - time.perf_counter(), 0))
+    except Exception:
+        future.cancel()
+        _record_degraded(name, degraded)
+        return fallback
+    timings[name] = elapsed
+    return result
 
 
 def prepare_search(
@@ -76,88 +227,353 @@ def prepare_search(
     """
     Prepare and execute search with parallel memory search and classification.
 
+    Image description, memory search and classification each have a deadline
+    within SEARCH_BUDGET_SECONDS. A stage that misses it is skipped: the answer
+    goes ahead without the image or memories, and a missing classification
+    falls back to a plain semantic search. An embedding that misses its
+    deadline falls back to a lexical or keyword search.
+
     Returns SearchResult with results, memories, and timing info.
     """
+    global _searches
+    with _stats_lock:
+        _searches += 1
+
     timings = {}
+    degraded = []
     total_start = time.perf_counter()
-    image_description = None
-    memories = ''
+    deadline = total_start + SEARCH_BUDGET_SECONDS
+
+    classify_future = start_stage('Classification', classify_query, user_query)
 
     # Get image description if URL provided
+    image_description = None
     if image_urls:
-        start = time.perf_counter()
-        image_description = describe_image(image_urls[0])
-        timings['Image'] = time.perf_counter() - start
+        image_future = start_stage('Image', describe_image, image_urls[0])
+        image_description = stage_result(
+            'Image', image_future, total_start, deadline, timings, degraded, None
+        )
 
     # Build memory search query
     memory_query = f'{user_query} {image_description}' if image_description else user_query
 
-    # Memory search and classification in parallel
-    def timed_memory_search():
+    # Memory search runs alongside classification
+    memory_start = time.perf_counter()
+    memory_future = start_stage('Memory', get_relevant_memories, memory_query)
+    memories = stage_result(
+        'Memory', memory_future, memory_start, deadline, timings, degraded, ''
+    )
+    classification = stage_result(
+        'Classification', classify_future, total_start, deadline, timings, degraded,
+        QueryClassification(type='semantic')
+    )
+
+    search_result = search_with_classification(
+        user_query,
+        classification,
+        memories=memories,
+        image_description=image_description,
+        top_k=top_k,
+        min_similarity=min_similarity,
+        timings=timings
+    )
+    search_result.degraded = degraded + search_result.degraded
+    timings['Total'] = time.perf_counter() - total_start
+    return search_result
+
+
+def search_with_classification(
+    user_query: str,
+    classification: QueryClassification,
+    memories: str = '',
+    image_description: str | None = None,
+    top_k: int = 10,
+    min_similarity: float = 0.05,
+    timings: dict | None = None,
+    speculative: SpeculativeSearch | None = None
+) -> SearchResult:
+    """
+    Run the database search for an already classified query.
+
+    `speculative` is a speculative_search() result for the same query and
+    memories; vector searches reuse it instead of embedding again.
+    """
+    timings = {} if timings is None else timings
+
+    # Country and variety are exact-match filters, and the classifier's guess
+    # ('USA', 'Cabernet') may not be a stored value. They only narrow the
+    # facet and keyword paths once resolved; ranked searches leave them to
+    # the embedding.
+    filters = classification.model_dump(exclude={'type', 'name', 'group_by', 'country', 'variety'})
+    facet_values = {
+        facet: resolve_facet_value(facet, getattr(classification, facet))
+        for facet in ('country', 'variety')
+    }
+    unresolved = any(
+        getattr(classification, facet) is not None and value is None
+        for facet, value in facet_values.items()
+    )
+    keyword_filters = {**filters, **facet_values}
+    text_query = classification.name
+    embedding = None
+    degraded = []
+
+    # "Which varieties does X rate highest" is answered from precomputed stats.
+    # They aren't broken down by points or price, so those queries search the table.
+    has_range_filter = any(
+        filters[name] is not None for name in ('min_points', 'max_points', 'min_price', 'max_price')
+    )
+    facets = []
+    if classification.group_by and not has_range_filter and not unresolved:
         start = time.perf_counter()
-        result = get_relevant_memories(memory_query)
-        timings['Memory'] = time.perf_counter() - start
-        return result
+        facets = get_facet_stats(
+            classification.group_by,
+            top_k=top_k,
+            taster_name=classification.taster_name,
+            **facet_values
+        ) or []
+        timings['DB'] = time.perf_counter() - start
 
-    def timed_classify():
+    rows = None
+    if facets:
+        rows = []
+
+    # Named wines and wineries are answered from the full-text index alone
+    elif classification.type == 'lexical' and text_query and not image_description:
         start = time.perf_counter()
-        result = classify_query(user_query)
-        timings['Classification'] = time.perf_counter() - start
-        return result
+        rows = search_reviews(top_k=top_k, text_query=text_query, **filters) or None
+        timings['DB'] = time.perf_counter() - start
+        if rows is None:
+            # The name matched nothing (misspelt or paraphrased), so search by meaning instead
+            text_query = None
+
+    # Embedding and DB search, fused with lexical matches when a name was given.
+    # A country or variety that matched no stored value is left to the embedding too.
+    if rows is None and (classification.type in ('semantic', 'lexical') or image_description
+                         or memories or unresolved):
+        ranked = _semantic_search(
+            user_query, memories, image_description, filters, text_query, top_k, min_similarity,
+            timings, degraded, speculative
+        )
+        if ranked is not None:
+            rows, embedding = ranked
+        elif text_query:
+            # No embedding in time, but the name can still be matched lexically
+            start = time.perf_counter()
+            rows = search_reviews(top_k=top_k, text_query=text_query, **filters) or None
+            timings['DB'] = time.perf_counter() - start
+
+    # Filters only, best rated first; also the fallback when no embedding arrived in time
+    if rows is None:
+        start = time.perf_counter()
+        filters = keyword_filters
+        rows = search_reviews(query_embedding=None, top_k=top_k, **filters)
+        timings['DB'] = time.perf_counter() - start
+        text_query = None
+
+    cursor = None
+    if not facets:
+        cursor = SearchCursor(
+            filters=filters,
+            query_embedding=embedding,
+            text_query=text_query,
+            min_similarity=min_similarity
+        )
+        _advance_cursor(cursor, rows, top_k)
 
-    with ThreadPoolExecutor(max_workers=2) as executor:
-        memory_future = executor.submit(timed_memory_search)
-        classify_future = executor.submit(timed_classify)
-        memories = memory_future.result()
-        classification = classify_future.result()
+    return SearchResult(
+        results=rows,
+        memories=memories,
+        image_description=image_description,
+        classification=classification,
+        timings=timings,
+        facets=facets,
+        degraded=degraded,
+        cursor=cursor
+    )
 
-    # Build search text
+
+def _search_text(user_query: str, memories: str, image_description: str | None) -> str:
     search_components = [user_query]
     if image_description:
         search_components.append(image_description)
     if memories:
         search_components.append(memories)
-    search_text = ' '.join(search_components)
+    return ' '.join(search_components)
 
-    # Embedding and DB search
-    if classification.type == 'semantic' or image_description or memories:
-        start = time.perf_counter()
-        embedding = embed_query(search_text)
-        timings['Embedding'] = time.perf_counter() - start
+
+def _matches_filters(row: dict, filters: dict) -> bool:
+    """Apply search_reviews' filter conditions to an already fetched row."""
+    for facet in ('taster_name', 'country', 'variety'):
+        value = filters.get(facet)
+        if value is not None and (row[facet] or '').lower() != value.lower():
+            return False
+    for column, bound, keep in (
+        ('points', filters.get('min_points'), lambda a, b: a >= b),
+        ('points', filters.get('max_points'), lambda a, b: a <= b),
+        ('price', filters.get('min_price'), lambda a, b: a >= b),
+        ('price', filters.get('max_price'), lambda a, b: a <= b),
+    ):
+        if bound is not None and (row[column] is None or not keep(row[column], bound)):
+            return False
+    return True
+
+
+def speculative_search(
+    user_query: str,
+    memories: str = '',
+    top_k: int = 10,
+    min_similarity: float = 0.05
+) -> SpeculativeSearch:
+    """
+    Embed the query and fetch unfiltered vector candidates before it is classified.
+
+    Run alongside the model's first turn in tool-calling mode. When the
+    tool call's filters leave at least top_k candidates (or every row above
+    min_similarity was fetched), those are exactly the filtered search's
+    results, so no embedding or DB call is left on the critical path.
+    """
+    search_text = _search_text(user_query, memories, None)
+    embedding = embed_query(search_text)
+    limit = top_k * SPECULATIVE_CANDIDATE_FACTOR
+    candidates = search_reviews(query_embedding=embedding, top_k=limit, min_similarity=min_similarity)
+    return SpeculativeSearch(
+        search_text=search_text,
+        embedding=embedding,
+        candidates=candidates,
+        limit=limit,
+        min_similarity=min_similarity
+    )
+
+
+def _semantic_search(
+    user_query: str,
+    memories: str,
+    image_description: str | None,
+    filters: dict,
+    text_query: str | None,
+    top_k: int,
+    min_similarity: float,
+    timings: dict,
+    degraded: list[str],
+    speculative: SpeculativeSearch | None = None
+) -> tuple[list[dict], list[float]] | None:
+    """
+    Vector search (hybrid when text_query is given) through the result cache.
+
+    A matching speculative search answers from its candidates when it can
+    and otherwise lends its embedding. Returns the rows and the embedding
+    they were ranked against, or None (recorded as degraded) if the
+    embedding call failed or timed out.
+    """
+    search_text = _search_text(user_query, memories, image_description)
+
+    if (speculative is not None and speculative.search_text == search_text
+            and speculative.min_similarity == min_similarity):
+        if text_query is None:
+            matching = [row for row in speculative.candidates if _matches_filters(row, filters)]
+            if len(matching) >= top_k or len(speculative.candidates) < speculative.limit:
+                return matching[:top_k], speculative.embedding
 
         start = time.perf_counter()
         rows = search_reviews(
-            query_embedding=embedding,
+            query_embedding=speculative.embedding,
             top_k=top_k,
             min_similarity=min_similarity,
-            taster_name=classification.taster_name,
-            min_points=classification.min_points,
-            max_points=classification.max_points,
-            min_price=classification.min_price,
-            max_price=classification.max_price
+            text_query=text_query,
+            **filters
         )
         timings['DB'] = time.perf_counter() - start
+        return rows, speculative.embedding
+
+    start = time.perf_counter()
+    try:
+        if search_text == user_query:
+            cache_embedding = embedding = embed_query(user_query)
+        else:
+            # One request for both: the bare query keys the cache, the full text ranks results
+            cache_embedding, embedding = embed_queries([user_query, search_text])
+    except Exception:
+        _record_degraded('Embedding', degraded)
+        return None
+    timings['Embedding'] = time.perf_counter() - start
+
+    # Memories and image description must match exactly, so shared memory
+    # text can't pull different requests' cache keys together
+    context = f'{image_description or ""}\0{memories or ""}'
+    cache_filters = {
+        **filters,
+        'name': text_query,
+        'context': hashlib.sha1(context.encode()).hexdigest(),
+        'top_k': top_k,
+        'min_similarity': min_similarity
+    }
+
+    start = time.perf_counter()
+    cached = result_cache.get(cache_embedding, cache_filters) if RESULT_CACHE_ENABLED else None
+    if cached is not None:
+        # Page on from the cached ranking, not the paraphrase's
+        timings['Cache'] = time.perf_counter() - start
+        return cached
+
+    start = time.perf_counter()
+    rows = search_reviews(
+        query_embedding=embedding,
+        top_k=top_k,
+        min_similarity=min_similarity,
+        text_query=text_query,
+        **filters
+    )
+    timings['DB'] = time.perf_counter() - start
+    if RESULT_CACHE_ENABLED:
+        result_cache.put(cache_embedding, cache_filters, rows, query_embedding=embedding)
+    return rows, embedding
+
+
+def _advance_cursor(cursor: SearchCursor, rows: list[dict], top_k: int):
+    """Move the cursor past the rows of the page just fetched."""
+    if len(rows) < top_k:
+        cursor.exhausted = True
+    if not rows:
+        return
+
+    last = rows[-1]
+    if cursor.text_query is not None:
+        cursor.offset += len(rows)
+    elif cursor.query_embedding is not None:
+        cursor.after = (last['similarity'], last['id'])
     else:
-        start = time.perf_counter()
-        rows = search_reviews(
-            query_embedding=None,
-            top_k=top_k,
-            taster_name=classification.taster_name,
-            min_points=classification.min_points,
-            max_points=classification.max_points,
-            min_price=classification.min_price,
-            max_price=classification.max_price
-        )
-        timings['DB'] = time.perf_counter() - start
+        cursor.after = (last['points'], last['price'], last['id'])
 
-    timings['Total'] = time.perf_counter() - total_start
+
+def fetch_more(previous: SearchResult, top_k: int = 10) -> SearchResult:
+    """
+    Fetch the next page of the previous search.
+
+    Reuses the stored embedding, filters and cursor, so no classification,
+    memory search or embedding call is repeated.
+    """
+    cursor = previous.cursor
+    start = time.perf_counter()
+    rows = search_reviews(
+        query_embedding=cursor.query_embedding,
+        top_k=top_k,
+        min_similarity=cursor.min_similarity,
+        text_query=cursor.text_query,
+        after=cursor.after,
+        offset=cursor.offset,
+        **cursor.filters
+    )
+    elapsed = time.perf_counter() - start
+    _advance_cursor(cursor, rows, top_k)
 
     return SearchResult(
         results=rows,
-        memories=memories,
-        image_description=image_description,
-        classification=classification,
-        timings=timings
+        memories=previous.memories,
+        image_description=previous.image_description,
+        classification=previous.classification,
+        timings={'DB': elapsed, 'Total': elapsed},
+        cursor=cursor
     )
 
 
@@ -181,3 +597,22 @@ def format_results_for_prompt(results: list[dict]) -> str:
             f'   Description: {description}'
         )
     return '\n\n'.join(lines)
+
+
+def format_facets_for_prompt(facets: list[dict]) -> str:
+    """Format facet summary stats for inclusion in LLM prompt."""
+    if not facets:
+        return ''
+
+    label = facets[0]['group_by'].replace('_', ' ').title()
+    lines = []
+    for index, row in enumerate(facets, start=1):
+        if row['price_median'] is not None:
+            price_str = f'${row["price_p25"]:.0f}-${row["price_p75"]:.0f} (median ${row["price_median"]:.0f})'
+        else:
+            price_str = 'N/A'
+        lines.append(
+            f'{index}. **{row["value"]}** ({label})\n'
+            f'   Reviews: {row["review_count"]} | Avg points: {row["avg_points"]:.1f} | Price: {price_str}'
+        )
+    return '\n\n'.join(lines)
@@ -0,0 +1,137 @@
+import time
+
+from pydantic import ValidationError
+
+from config import SEARCH_BUDGET_SECONDS, STAGE_DEADLINES
+from core.memory import get_relevant_memories
+from core.models import QueryClassification
+from core.search import (
+    SearchResult,
+    format_facets_for_prompt,
+    format_results_for_prompt,
+    search_with_classification,
+    speculative_search,
+    stage_result,
+    start_stage,
+)
+
+
+def _strict_schema(model) -> dict:
+    """
+    JSON schema for a pydantic model in the form strict function tools require.
+
+    Every property is required and unknown ones are rejected; optional fields
+    stay optional by being nullable, which their anyOf with null already says.
+    """
+    schema = model.model_json_schema()
+    properties = {
+        name: {key: value for key, value in spec.items() if key not in ('default', 'title')}
+        for name, spec in schema['properties'].items()
+    }
+    return {
+        'type': 'object',
+        'properties': properties,
+        'required': list(properties),
+        'additionalProperties': False,
+    }
+
+
+# The answering model fills in the same fields the classifier would
+SEARCH_TOOL = {
+    'type': 'function',
+    'name': 'search_reviews',
+    'description': (
+        'Search 130k+ wine reviews. Use it for any request for wine recommendations or facts '
+        'about wines, wineries, tasters, prices or ratings. Use null for anything the user '
+        'did not ask for.'
+    ),
+    'parameters': _strict_schema(QueryClassification),
+    'strict': True,
+}
+
+
+def format_search_output(search_result: SearchResult) -> str:
+    """Format a search result as the tool output the model answers from."""
+    sections = []
+    if search_result.memories:
+        sections.append(
+            f'## Memory Context\nUser preferences from past interactions:\n{search_result.memories}'
+        )
+
+    results_text = '\n\n'.join(filter(None, [
+        format_facets_for_prompt(search_result.facets),
+        format_results_for_prompt(search_result.results),
+    ]))
+    if results_text:
+        sections.append(f'## Search Results\n{results_text}')
+    else:
+        sections.append('No search results were found.')
+    return '\n\n'.join(sections)
+
+
+class SearchToolRunner:
+    """
+    Runs search_reviews tool calls locally for one user query.
+
+    Memory search starts straight away, followed by a speculative embedding
+    and unfiltered vector search, all overlapping the model's first
+    round-trip. When the model asks for a search, its filters are usually
+    applied to those candidates with no further embedding or DB call.
+    """
+
+    def __init__(self, user_query: str, top_k: int = 10):
+        self.user_query = user_query
+        self.top_k = top_k
+        self.started = time.perf_counter()
+        self.timings = {}
+        self.degraded = []
+        self.search_result: SearchResult | None = None
+        self._memories: str | None = None
+        self._memory_future = start_stage('Memory', get_relevant_memories, user_query)
+        self._speculative_future = start_stage('Speculative', self._speculate)
+
+    def _speculate(self):
+        # Same memories the tool call will use: whatever arrives by the memory deadline
+        try:
+            memories, _ = self._memory_future.result(
+                timeout=max(self.started + STAGE_DEADLINES['Memory'] - time.perf_counter(), 0)
+            )
+        except Exception:
+            memories = ''
+        return speculative_search(self.user_query, memories, self.top_k)
+
+    def _speculative_result(self):
+        try:
+            result, _ = self._speculative_future.result(timeout=STAGE_DEADLINES['Embedding'])
+        except Exception:
+            return None
+        return result
+
+    def run(self, name: str, arguments: str) -> str:
+        """Execute one tool call and return its output for the model."""
+        if name != SEARCH_TOOL['name']:
+            return f'Unknown tool: {name}'
+
+        try:
+            classification = QueryClassification.model_validate_json(arguments)
+        except ValidationError as e:
+            return f'Invalid arguments: {e}'
+
+        if self._memories is None:
+            self._memories = stage_result(
+                'Memory', self._memory_future, self.started,
+                self.started + SEARCH_BUDGET_SECONDS, self.timings, self.degraded, ''
+            )
+
+        self.search_result = search_with_classification(
+            self.user_query,
+            classification,
+            memories=self._memories,
+            top_k=self.top_k,
+            timings=self.timings,
+            speculative=self._speculative_result()
+        )
+        self.timings['Total'] = time.perf_counter() - self.started
+        self.degraded.extend(self.search_result.degraded)
+        self.search_result.degraded = self.degraded
+        return format_search_output(self.search_result)
@@ -1,48 +1,260 @@
-import psycopg2
-from psycopg2.pool import ThreadedConnectionPool
-from contextlib import contextmanager
-
-# Pool
-_pool = None
-
-def init_pool():
-    global _pool
-    _pool = ThreadedConnectionPool(
-        minconn=2,
-        maxconn=20,
-        host="localhost",
-        port=5432,
-        user="saurabhkamboj",
-        database="wine_reviews"
-    )
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+import psycopg2.errors
+
+from db_pool import get_connection
+
+# Slow query log
+SLOW_QUERY_MS = float(os.getenv('DB_SLOW_QUERY_MS', '200'))
+EXPLAIN_SAMPLE_RATE = float(os.getenv('DB_EXPLAIN_SAMPLE_RATE', '0.1'))
+SLOW_QUERY_LOG = os.getenv('DB_SLOW_QUERY_LOG', 'slow_queries.jsonl')
+HNSW_INDEX = 'idx_reviews_embedding_hnsw'
+
+# Plans are captured after results are returned, on a worker with its own
+# pooled connection; past MAX_QUEUED_PLANS waiting, slow queries are logged without one
+MAX_QUEUED_PLANS = 10
+
+_slow_queries = deque(maxlen=200)
+_slow_log_lock = threading.Lock()
+_slow_log_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='slow-query-log')
+_plan_slots = threading.BoundedSemaphore(MAX_QUEUED_PLANS)
+_explain_all = False
+
+
+def capture_plans(enabled: bool):
+    """Capture an EXPLAIN plan for every slow query, not just a sample."""
+    global _explain_all
+    _explain_all = enabled
+
+
+def _redact(value):
+    # Embeddings are logged as a short hash so identical queries can still be matched
+    if isinstance(value, list):
+        digest = hashlib.sha1(json.dumps(value).encode()).hexdigest()[:12]
+        return f'<vector sha1:{digest}>'
+    return value
 
-@contextmanager
-def get_connection():
-    conn = _pool.getconn()
+
+def _plan_summary(plan):
+    """Classify a JSON plan by how it reached the reviews (hnsw, seq_scan, ...)."""
+    scans = []
+    node_types = set()
+    nodes = [plan[0]['Plan']]
+    while nodes:
+        node = nodes.pop()
+        node_types.add(node['Node Type'])
+        if 'Relation Name' in node:
+            target = f"using {node['Index Name']}" if 'Index Name' in node else f"on {node['Relation Name']}"
+            scans.append(f"{node['Node Type']} {target}")
+        nodes.extend(node.get('Plans', []))
+
+    if any(HNSW_INDEX in scan for scan in scans):
+        plan_type = 'hnsw'
+    elif 'Seq Scan' in node_types:
+        plan_type = 'seq_scan'
+    elif node_types & {'Bitmap Heap Scan', 'Bitmap Index Scan'}:
+        plan_type = 'bitmap_index'
+    elif node_types & {'Index Scan', 'Index Only Scan'}:
+        plan_type = 'index_scan'
+    else:
+        plan_type = plan[0]['Plan']['Node Type']
+    return plan_type, scans
+
+
+def _log_slow_query(entry, sql, params, capture_plan):
+    """
+    Record a slow query, re-running it under EXPLAIN ANALYZE if sampled (runs on the log worker).
+
+    A query that was canceled would hit the statement timeout again, so only
+    its estimated plan is captured.
+    """
+    if capture_plan:
+        explain = "EXPLAIN (FORMAT JSON)" if 'error' in entry else "EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON)"
+        try:
+            with get_connection(readonly=True) as conn:
+                cur = conn.cursor()
+                cur.execute(f"{explain} {sql}", params)
+                plan = cur.fetchone()[0]
+                cur.close()
+            entry['plan_type'], entry['scans'] = _plan_summary(plan)
+            entry['plan'] = plan
+        except Exception as e:
+            entry['plan_error'] = str(e)
+        finally:
+            _plan_slots.release()
+
+    with _slow_log_lock:
+        _slow_queries.append(entry)
+        with open(SLOW_QUERY_LOG, 'a') as file:
+            file.write(json.dumps(entry, default=str) + '\n')
+
+
+def _run_query(sql, params, shape):
+    """Run a read query, logging it with its filter shape if it is slow or canceled."""
+    error = None
+    with get_connection(readonly=True) as conn:
+        cur = conn.cursor()
+        start = time.perf_counter()
+        try:
+            cur.execute(sql, params)
+            rows = cur.fetchall()
+        except psycopg2.errors.QueryCanceled as e:
+            error = e
+        elapsed = time.perf_counter() - start
+        cur.close()
+
+    if error is not None or elapsed * 1000 >= SLOW_QUERY_MS:
+        entry = {
+            'time': datetime.now(timezone.utc).isoformat(),
+            'duration_ms': round(elapsed * 1000, 1),
+            **shape,
+            'params': [_redact(param) for param in params],
+            'plan_type': None,
+        }
+        if error is not None:
+            entry['error'] = str(error).strip()
+        sampled = _explain_all or random.random() < EXPLAIN_SAMPLE_RATE
+        capture_plan = sampled and _plan_slots.acquire(blocking=False)
+        _slow_log_executor.submit(_log_slow_query, entry, sql, params, capture_plan)
+
+    if error is not None:
+        raise error
+    return rows
+
+
+def slow_query_report(path=SLOW_QUERY_LOG):
+    """Group logged slow and canceled queries by filter shape and plan type, slowest total first."""
     try:
-        yield conn
-    finally:
-        _pool.putconn(conn)
+        with open(path) as file:
+            entries = [json.loads(line) for line in file if line.strip()]
+    except FileNotFoundError:
+        entries = list(_slow_queries)
+
+    groups = {}
+    canceled = {}
+    for entry in entries:
+        key = (entry['mode'], tuple(entry['filters']), entry.get('paged', False), entry.get('plan_type'))
+        groups.setdefault(key, []).append(entry['duration_ms'])
+        canceled[key] = canceled.get(key, 0) + ('error' in entry)
+
+    report = [
+        {
+            'mode': mode,
+            'filters': list(filters),
+            'paged': paged,
+            'plan_type': plan_type or 'not captured',
+            'count': len(durations),
+            'canceled': canceled[(mode, filters, paged, plan_type)],
+            'avg_ms': sum(durations) / len(durations),
+            'max_ms': max(durations),
+        }
+        for (mode, filters, paged, plan_type), durations in groups.items()
+    ]
+    return sorted(report, key=lambda row: row['avg_ms'] * row['count'], reverse=True)
+
+
+def get_reviews_version():
+    """
+    Return the reviews data version, bumped by a trigger on every write.
+
+    Read from the same pool as searches, so with a lagging replica the
+    version never runs ahead of the data the cached results came from.
+    """
+    with get_connection(readonly=True) as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT version FROM reviews_version")
+        row = cur.fetchone()
+        cur.close()
+    return row[0] if row else None
 
 # Search
-def search_reviews(query_embedding=None, top_k=10, min_similarity=0.05, taster_name=None,
-                   min_points=None, max_points=None, min_price=None, max_price=None):
-    select_cols = (
-        'id, title, variety, winery, country, province, description, '
-        'points, price, taster_name, taster_twitter_handle'
-    )
+SELECT_COLS = (
+    'id, title, variety, winery, country, province, description, '
+    'points, price, taster_name, taster_twitter_handle'
+)
+
+# Reciprocal rank fusion constant and how many candidates each ranking contributes
+RRF_K = 60
+HYBRID_CANDIDATE_FACTOR = 4
+
+# Precomputed per-facet top lists and summary stats (see setup_db.py)
+FACET_COLUMNS = ('taster_name', 'country', 'variety')
+FACET_TOP_N = 50
+FACET_STATS_GROUPS = {
+    ('taster_name',), ('country',), ('variety',),
+    ('country', 'taster_name'), ('taster_name', 'variety'), ('country', 'variety'),
+}
+SUMMARY_VIEWS = ('reviews_top_by_facet', 'reviews_facet_stats')
+
+# Distinct facet values, used to check classifier guesses before filtering on them
+FACET_VALUES_TTL_SECONDS = 600
+_facet_values: dict[str, tuple[float, dict]] = {}
+_facet_values_lock = threading.Lock()
+
+LEXICAL_MATCH = "(search_tsv @@ text_query OR %s <%% title OR %s <%% winery)"
+LEXICAL_SCORE = (
+    "ts_rank_cd(search_tsv, text_query) + "
+    "GREATEST(word_similarity(%s, title), word_similarity(%s, winery))"
+)
+
 
+def refresh_summary_views(cur):
+    """Rebuild the precomputed facet views after reviews were loaded."""
+    for view in SUMMARY_VIEWS:
+        cur.execute(f"REFRESH MATERIALIZED VIEW CONCURRENTLY {view}")
+
+
+def get_facet_values(facet):
+    """
+    Distinct values of a taster/country/variety column, keyed by lowercase value.
+
+    Read from reviews_facet_stats and reloaded every FACET_VALUES_TTL_SECONDS.
+    """
+    with _facet_values_lock:
+        cached = _facet_values.get(facet)
+    if cached is not None and time.monotonic() - cached[0] < FACET_VALUES_TTL_SECONDS:
+        return cached[1]
+
+    sql = f"SELECT {facet} FROM reviews_facet_stats WHERE grouping = %s AND {facet} <> ''"
+    rows = _run_query(sql, [facet], {'mode': 'facet_values', 'filters': [], 'group_by': facet})
+    values = {row[0].lower(): row[0] for row in rows}
+    with _facet_values_lock:
+        _facet_values[facet] = (time.monotonic(), values)
+    return values
+
+
+def resolve_facet_value(facet, value):
+    """Return the stored spelling of a facet value, or None if reviews have no such value."""
+    if value is None:
+        return None
+    return get_facet_values(facet).get(value.strip().lower())
+
+
+def _filter_conditions(taster_name=None, country=None, variety=None, min_points=None,
+                       max_points=None, min_price=None, max_price=None):
     conditions = []
     params = []
 
-    if query_embedding is not None:
-        conditions.append("1 - (embedding <=> %s::vector) > %s")
-        params.extend([query_embedding, min_similarity])
-
     if taster_name is not None:
         conditions.append("LOWER(taster_name) = LOWER(%s)")
         params.append(taster_name)
 
+    if country is not None:
+        conditions.append("LOWER(country) = LOWER(%s)")
+        params.append(country)
+
+    if variety is not None:
+        conditions.append("LOWER(variety) = LOWER(%s)")
+        params.append(variety)
+
     if min_points is not None:
         conditions.append("points >= %s")
         params.append(min_points)
@@ -59,47 +271,239 @@ def search_reviews(query_embedding=None, top_k=10, min_similarity=0.05, taster_n
         conditions.append("price <= %s")
         params.append(max_price)
 
-    where_clause = " AND ".join(conditions) if conditions else "TRUE"
+    return conditions, params
+
+
+def _after_best_rated(after):
+    """Keyset condition for rows after (points, price, id) in best-rated order."""
+    points, price, review_id = after
+    if price is None:
+        # NULL prices sort last, so only later ids with the same points and no price follow
+        sql = "(points < %s OR (points = %s AND price IS NULL AND id > %s))"
+        return sql, [points, points, review_id]
+    sql = (
+        "(points < %s OR (points = %s AND (price > %s OR price IS NULL"
+        " OR (price = %s AND id > %s))))"
+    )
+    return sql, [points, points, price, price, review_id]
+
+
+def _row_to_dict(row):
+    return {
+        'id': row[0],
+        'title': row[1],
+        'variety': row[2],
+        'winery': row[3],
+        'country': row[4],
+        'province': row[5],
+        'description': row[6],
+        'points': row[7],
+        'price': float(row[8]) if row[8] is not None else None,
+        'taster_name': row[9],
+        'taster_twitter_handle': row[10],
+        'similarity': float(row[11]) if row[11] is not None else None
+    }
+
+
+def _fetch_rows(sql, params, shape):
+    return [_row_to_dict(row) for row in _run_query(sql, params, shape)]
+
+
+def _search_top_by_facet(facet, facet_value, conditions, filter_params, top_k, shape):
+    """Best rated reviews for one taster/country/variety from the precomputed lists."""
+    where_clause = " AND ".join(["facet = %s", "LOWER(facet_value) = LOWER(%s)"] + conditions)
+    sql = f"""
+        SELECT {SELECT_COLS}, NULL AS similarity
+        FROM reviews_top_by_facet
+        WHERE {where_clause}
+        ORDER BY rank
+        LIMIT %s
+    """
+    return _fetch_rows(sql, [facet, facet_value] + filter_params + [top_k], shape)
 
-    if query_embedding is not None:
+
+def search_reviews(query_embedding=None, top_k=10, min_similarity=0.05, taster_name=None,
+                   country=None, variety=None, min_points=None, max_points=None,
+                   min_price=None, max_price=None, text_query=None, after=None, offset=0):
+    """
+    Search reviews, picking the mode from the arguments given:
+    vector (query_embedding), lexical (text_query), hybrid (both, merged with
+    reciprocal rank fusion) or keyword (filters only, best rated first).
+    Keyword searches on a single taster, country or variety are served from
+    the precomputed top lists when they can answer them.
+
+    Later pages use keyset pagination: pass `after` as (similarity, id) of the
+    last vector result or (points, price, id) of the last keyword result.
+    Lexical and hybrid rankings are paged with `offset`.
+    """
+    conditions, filter_params = _filter_conditions(
+        taster_name, country, variety, min_points, max_points, min_price, max_price
+    )
+    facets = {'taster_name': taster_name, 'country': country, 'variety': variety}
+    facets_set = [facet for facet in FACET_COLUMNS if facets[facet] is not None]
+    filters = {
+        **facets, 'min_points': min_points, 'max_points': max_points,
+        'min_price': min_price, 'max_price': max_price,
+    }
+    shape = {
+        'filters': [name for name, value in filters.items() if value is not None],
+        'paged': after is not None or offset > 0,
+    }
+
+    if (query_embedding is None and text_query is None and after is None
+            and len(facets_set) == 1 and top_k <= FACET_TOP_N):
+        facet = facets_set[0]
+        results = _search_top_by_facet(
+            facet, facets[facet], conditions, filter_params, top_k, {**shape, 'mode': 'facet_top'}
+        )
+        # With extra filters the top list may hold too few matches; fall through to the table
+        has_extra_filters = len(conditions) > 1
+        if len(results) == top_k or not has_extra_filters:
+            return results
+
+    if query_embedding is not None and text_query is not None:
+        shape['mode'] = 'hybrid'
+        candidates = (offset + top_k) * HYBRID_CANDIDATE_FACTOR
+        filter_clause = "".join(f" AND {condition}" for condition in conditions)
+        sql = f"""
+            WITH vector_ranked AS (
+                SELECT id, distance, ROW_NUMBER() OVER (ORDER BY distance) AS rank
+                FROM (
+                    SELECT id, embedding <=> %s::vector AS distance
+                    FROM reviews
+                    WHERE 1 - (embedding <=> %s::vector) > %s{filter_clause}
+                    ORDER BY embedding <=> %s::vector
+                    LIMIT %s
+                ) AS vector_candidates
+            ),
+            lexical_ranked AS (
+                SELECT id, ROW_NUMBER() OVER (ORDER BY score DESC) AS rank
+                FROM (
+                    SELECT id, {LEXICAL_SCORE} AS score
+                    FROM reviews, websearch_to_tsquery('english', %s) AS text_query
+                    WHERE {LEXICAL_MATCH}{filter_clause}
+                    ORDER BY score DESC
+                    LIMIT %s
+                ) AS lexical_candidates
+            )
+            SELECT {SELECT_COLS}, 1 - vector_ranked.distance AS similarity
+            FROM vector_ranked
+            FULL OUTER JOIN lexical_ranked USING (id)
+            JOIN reviews USING (id)
+            ORDER BY COALESCE(1.0 / (%s + vector_ranked.rank), 0)
+                   + COALESCE(1.0 / (%s + lexical_ranked.rank), 0) DESC, id
+            LIMIT %s OFFSET %s
+        """
+        params = (
+            [query_embedding, query_embedding, min_similarity] + filter_params
+            + [query_embedding, candidates]
+            + [text_query, text_query, text_query, text_query, text_query] + filter_params
+            + [candidates, RRF_K, RRF_K, top_k, offset]
+        )
+    elif text_query is not None:
+        shape['mode'] = 'lexical'
+        where_clause = " AND ".join([LEXICAL_MATCH] + conditions)
         sql = f"""
-            SELECT {select_cols}, 1 - (embedding <=> %s::vector) AS similarity
+            SELECT {SELECT_COLS}, NULL AS similarity
+            FROM reviews, websearch_to_tsquery('english', %s) AS text_query
+            WHERE {where_clause}
+            ORDER BY {LEXICAL_SCORE} DESC, points DESC, id
+            LIMIT %s OFFSET %s
+        """
+        params = (
+            [text_query, text_query, text_query] + filter_params
+            + [text_query, text_query, top_k, offset]
+        )
+    elif query_embedding is not None:
+        shape['mode'] = 'vector'
+        where_clause = " AND ".join(["1 - (embedding <=> %s::vector) > %s"] + conditions)
+        after_params = []
+        if after is not None:
+            # Ordered by distance alone so the HNSW index can serve it; id only breaks exact ties.
+            # The keyset condition filters the index scan, so later pages rely on
+            # hnsw.iterative_scan (see db_pool.py) to keep scanning past ef_search.
+            where_clause += (
+                " AND (1 - (embedding <=> %s::vector) < %s"
+                " OR (1 - (embedding <=> %s::vector) = %s AND id > %s))"
+            )
+            similarity, review_id = after
+            after_params = [query_embedding, similarity, query_embedding, similarity, review_id]
+        sql = f"""
+            SELECT {SELECT_COLS}, 1 - (embedding <=> %s::vector) AS similarity
             FROM reviews
             WHERE {where_clause}
             ORDER BY embedding <=> %s::vector
             LIMIT %s
         """
-        params = [query_embedding] + params + [query_embedding, top_k]
+        params = (
+            [query_embedding, query_embedding, min_similarity] + filter_params + after_params
+            + [query_embedding, top_k]
+        )
     else:
+        shape['mode'] = 'keyword'
+        after_params = []
+        if after is not None:
+            after_condition, after_params = _after_best_rated(after)
+            conditions = conditions + [after_condition]
+        where_clause = " AND ".join(conditions) if conditions else "TRUE"
         sql = f"""
-            SELECT {select_cols}
+            SELECT {SELECT_COLS}, NULL AS similarity
             FROM reviews
             WHERE {where_clause}
-            ORDER BY points DESC NULLS LAST, price NULLS LAST
+            ORDER BY points DESC NULLS LAST, price NULLS LAST, id
             LIMIT %s
         """
-        params.append(top_k)
+        params = filter_params + after_params + [top_k]
 
-    with get_connection() as conn:
-        cur = conn.cursor()
-        cur.execute(sql, params)
-        rows = cur.fetchall()
-        cur.close()
+    return _fetch_rows(sql, params, shape)
+
+
+def get_facet_stats(group_by, top_k=10, min_reviews=5, taster_name=None, country=None, variety=None):
+    """
+    Summary stats per taster, country or variety, best average points first.
+
+    Other facet values narrow the group (e.g. varieties for one taster).
+    Stats cover all points and prices, so callers with a points or price
+    filter should search the table instead. Returns None when the
+    combination is not precomputed.
+    """
+    facets = {'taster_name': taster_name, 'country': country, 'variety': variety}
+    grouping = tuple(sorted({group_by} | {facet for facet, value in facets.items() if value is not None}))
+    if group_by not in FACET_COLUMNS or grouping not in FACET_STATS_GROUPS:
+        return None
+
+    conditions = ["grouping = %s", f"{group_by} <> ''", "review_count >= %s"]
+    params = [','.join(grouping), min_reviews]
+    for facet, value in facets.items():
+        if value is not None:
+            conditions.append(f"LOWER({facet}) = LOWER(%s)")
+            params.append(value)
+
+    sql = f"""
+        SELECT {group_by}, review_count, avg_points, price_p25, price_median, price_p75
+        FROM reviews_facet_stats
+        WHERE {" AND ".join(conditions)}
+        ORDER BY avg_points DESC, review_count DESC
+        LIMIT %s
+    """
+    params.append(top_k)
+
+    shape = {
+        'mode': 'facet_stats',
+        'filters': [facet for facet, value in facets.items() if value is not None],
+        'group_by': group_by,
+    }
+    rows = _run_query(sql, params, shape)
 
-    results = []
-    for row in rows:
-        results.append({
-            'id': row[0],
-            'title': row[1],
-            'variety': row[2],
-            'winery': row[3],
-            'country': row[4],
-            'province': row[5],
-            'description': row[6],
-            'points': row[7],
-            'price': float(row[8]) if row[8] is not None else None,
-            'taster_name': row[9],
-            'taster_twitter_handle': row[10],
-            'similarity': float(row[11]) if query_embedding is not None else None
-        })
-    return results
+    return [
+        {
+            'group_by': group_by,
+            'value': row[0],
+            'review_count': row[1],
+            'avg_points': float(row[2]),
+            'price_p25': float(row[3]) if row[3] is not None else None,
+            'price_median': float(row[4]) if row[4] is not None else None,
+            'price_p75': float(row[5]) if row[5] is not None else None,
+        }
+        for row in rows
+    ]
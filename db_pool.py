@@ -0,0 +1,224 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+
+import psycopg2
+from dotenv import load_dotenv
+from psycopg2.pool import ThreadedConnectionPool
+
+load_dotenv()
+
+# Connection settings, overridable from the environment
+DB_SETTINGS = {
+    'host': os.getenv('DB_HOST', 'localhost'),
+    'port': int(os.getenv('DB_PORT', '5432')),
+    'user': os.getenv('DB_USER', 'saurabhkamboj'),
+    'password': os.getenv('DB_PASSWORD'),
+    'database': os.getenv('DB_NAME', 'wine_reviews'),
+    'application_name': os.getenv('DB_APPLICATION_NAME', 'wine-review-chatloop'),
+}
+REPLICA_DSN = os.getenv('DB_REPLICA_DSN')
+
+POOL_MIN = int(os.getenv('DB_POOL_MIN', '2'))
+POOL_MAX = int(os.getenv('DB_POOL_MAX', '20'))
+
+# Per-connection session settings
+STATEMENT_TIMEOUT_MS = int(os.getenv('DB_STATEMENT_TIMEOUT_MS', '5000'))
+HNSW_EF_SEARCH = int(os.getenv('DB_HNSW_EF_SEARCH', '40'))
+# A plain HNSW scan returns at most ef_search rows, before filters and the /more
+# keyset condition are applied. Iterative scans (pgvector 0.8+) keep scanning
+# until LIMIT is filled; set DB_HNSW_ITERATIVE_SCAN to '' on older pgvector.
+HNSW_ITERATIVE_SCAN = os.getenv('DB_HNSW_ITERATIVE_SCAN', 'strict_order')
+
+# Connections older than this are replaced; ones idle longer than the check interval are pinged first
+MAX_CONNECTION_AGE = float(os.getenv('DB_MAX_CONNECTION_AGE', '1800'))
+IDLE_CHECK_SECONDS = float(os.getenv('DB_IDLE_CHECK_SECONDS', '30'))
+
+
+def _connect_kwargs() -> dict:
+    return {key: value for key, value in DB_SETTINGS.items() if value is not None}
+
+
+def connect():
+    """Open a standalone connection without pool session limits (for setup and ingest scripts)."""
+    return psycopg2.connect(**_connect_kwargs())
+
+
+@dataclass
+class PoolStats:
+    """Acquire-wait and checkout-duration counters for one pool."""
+    checkouts: int = 0
+    wait_total: float = 0.0
+    wait_max: float = 0.0
+    checkout_total: float = 0.0
+    checkout_max: float = 0.0
+    recycled: int = 0
+
+    def record(self, wait: float, duration: float):
+        self.checkouts += 1
+        self.wait_total += wait
+        self.wait_max = max(self.wait_max, wait)
+        self.checkout_total += duration
+        self.checkout_max = max(self.checkout_max, duration)
+
+    def as_dict(self) -> dict:
+        checkouts = self.checkouts or 1
+        return {
+            'checkouts': self.checkouts,
+            'avg_wait_ms': self.wait_total / checkouts * 1000,
+            'max_wait_ms': self.wait_max * 1000,
+            'avg_checkout_ms': self.checkout_total / checkouts * 1000,
+            'max_checkout_ms': self.checkout_max * 1000,
+            'recycled': self.recycled,
+        }
+
+
+class ConnectionPool:
+    """
+    Thread-safe pool that blocks when exhausted instead of raising.
+
+    New connections get session setup (statement timeout, hnsw.ef_search,
+    hnsw.iterative_scan). On checkout, connections past MAX_CONNECTION_AGE
+    are replaced and ones idle longer than IDLE_CHECK_SECONDS are pinged and
+    replaced if dead.
+    """
+
+    def __init__(self, minconn: int, maxconn: int, **connect_kwargs):
+        self.minconn = minconn
+        self._pool = ThreadedConnectionPool(minconn, maxconn, **connect_kwargs)
+        self._slots = threading.BoundedSemaphore(maxconn)
+        self._lock = threading.Lock()
+        self._created: dict[int, float] = {}
+        self._last_used: dict[int, float] = {}
+        self.stats = PoolStats()
+
+    def warm(self):
+        """Check out minconn connections once so their session setup is done up front."""
+        connections = [self._checkout() for _ in range(self.minconn)]
+        for conn in connections:
+            self._checkin(conn)
+
+    @contextmanager
+    def connection(self):
+        start = time.perf_counter()
+        self._slots.acquire()
+        try:
+            conn = self._checkout()
+            checked_out = time.perf_counter()
+            try:
+                yield conn
+            finally:
+                self._checkin(conn)
+                with self._lock:
+                    self.stats.record(checked_out - start, time.perf_counter() - checked_out)
+        finally:
+            self._slots.release()
+
+    def _checkout(self):
+        while True:
+            conn = self._pool.getconn()
+            created = self._created.get(id(conn))
+            if created is None:
+                try:
+                    self._setup_session(conn)
+                except psycopg2.Error:
+                    self._pool.putconn(conn, close=True)
+                    raise
+                self._created[id(conn)] = time.monotonic()
+                return conn
+            if self._is_healthy(conn, created):
+                return conn
+            self._discard(conn)
+
+    def _is_healthy(self, conn, created: float) -> bool:
+        now = time.monotonic()
+        if conn.closed or now - created > MAX_CONNECTION_AGE:
+            return False
+        if now - self._last_used.get(id(conn), now) < IDLE_CHECK_SECONDS:
+            return True
+        return self._is_alive(conn)
+
+    def _checkin(self, conn):
+        self._last_used[id(conn)] = time.monotonic()
+        self._pool.putconn(conn, close=bool(conn.closed))
+        if conn.closed:
+            self._forget(conn)
+
+    def _discard(self, conn):
+        with self._lock:
+            self.stats.recycled += 1
+        self._forget(conn)
+        self._pool.putconn(conn, close=True)
+
+    def _forget(self, conn):
+        self._created.pop(id(conn), None)
+        self._last_used.pop(id(conn), None)
+
+    @staticmethod
+    def _is_alive(conn) -> bool:
+        try:
+            cur = conn.cursor()
+            cur.execute("SELECT 1")
+            cur.close()
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    @staticmethod
+    def _setup_session(conn):
+        cur = conn.cursor()
+        cur.execute("SET statement_timeout = %s", (STATEMENT_TIMEOUT_MS,))
+        cur.execute("SET hnsw.ef_search = %s", (HNSW_EF_SEARCH,))
+        if HNSW_ITERATIVE_SCAN:
+            cur.execute("SET hnsw.iterative_scan = %s", (HNSW_ITERATIVE_SCAN,))
+        cur.close()
+        conn.commit()
+
+    def close(self):
+        self._pool.closeall()
+
+
+# Pools
+_primary = None
+_replica = None
+
+
+def init_pool():
+    """
+    Create and warm the primary pool, plus a read pool when DB_REPLICA_DSN is set.
+
+    Safe to call again after a failed attempt; pools left from it are closed.
+    """
+    global _primary, _replica
+    for pool in (_primary, _replica):
+        if pool is not None:
+            pool.close()
+    _primary = _replica = None
+
+    _primary = ConnectionPool(POOL_MIN, POOL_MAX, **_connect_kwargs())
+    _primary.warm()
+
+    if REPLICA_DSN:
+        _replica = ConnectionPool(
+            POOL_MIN, POOL_MAX, dsn=REPLICA_DSN, application_name=DB_SETTINGS['application_name']
+        )
+        _replica.warm()
+
+
+@contextmanager
+def get_connection(readonly: bool = False):
+    """Borrow a pooled connection; read-only work goes to the replica if configured."""
+    pool = _replica if readonly and _replica is not None else _primary
+    with pool.connection() as conn:
+        yield conn
+
+
+def get_pool_stats() -> dict:
+    """Acquire-wait and checkout-duration metrics per pool."""
+    stats = {'DB pool': _primary.stats.as_dict() if _primary else {}}
+    if _replica is not None:
+        stats['DB replica pool'] = _replica.stats.as_dict()
+    return stats
@@ -1,9 +1,11 @@
 import json
 from openai import OpenAI
-import psycopg2
 from psycopg2.extras import execute_values
 from dotenv import load_dotenv
 
+from database_helper import refresh_summary_views
+from db_pool import connect
+
 load_dotenv()
 client = OpenAI()
 
@@ -14,12 +16,7 @@ def load_reviews():
 
 def generate_embeddings(batch_size=300):
     # Connect to Postgres
-    conn = psycopg2.connect(
-        host="localhost",
-        port=5432,
-        user="saurabhkamboj",
-        database="wine_reviews"
-    )
+    conn = connect()
     cursor = conn.cursor()
 
     try:
@@ -95,6 +92,10 @@ def generate_embeddings(batch_size=300):
         conn.commit()
         print("All embeddings stored successfully!")
 
+        refresh_summary_views(cursor)
+        conn.commit()
+        print("Summary views refreshed.")
+
     except Exception as e:
         print("Error generating embeddings:", e)
 
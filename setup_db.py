@@ -1,20 +1,14 @@
-import psycopg2
-from dotenv import load_dotenv
+from database_helper import FACET_COLUMNS, FACET_TOP_N, SELECT_COLS
+from db_pool import connect
 
-load_dotenv()
-
-conn = psycopg2.connect(
-    host="localhost",
-    port=5432,
-    user="saurabhkamboj",
-    database="wine_reviews"
-)
+conn = connect()
 
 cur = conn.cursor()
 
 try:
     # Extension
     cur.execute("CREATE EXTENSION IF NOT EXISTS vector;")
+    cur.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm;")
 
     # Table
     cur.execute("""
@@ -37,6 +31,44 @@ try:
     conn.commit()
     print("Table created.")
 
+    # Full-text search column, kept in sync by Postgres
+    cur.execute("""
+        ALTER TABLE reviews ADD COLUMN IF NOT EXISTS search_tsv tsvector
+        GENERATED ALWAYS AS (
+            setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+            setweight(to_tsvector('english', coalesce(winery, '')), 'A') ||
+            setweight(to_tsvector('english', coalesce(variety, '')), 'B') ||
+            setweight(to_tsvector('english', description), 'C')
+        ) STORED;
+    """)
+    conn.commit()
+    print("Full-text column created.")
+
+    # Data version, bumped on every write so caches can tell when reviews changed
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS reviews_version (
+            id boolean PRIMARY KEY DEFAULT TRUE CHECK (id),
+            version bigint NOT NULL DEFAULT 0
+        );
+    """)
+    cur.execute("INSERT INTO reviews_version DEFAULT VALUES ON CONFLICT DO NOTHING;")
+    cur.execute("""
+        CREATE OR REPLACE FUNCTION bump_reviews_version() RETURNS trigger AS $$
+        BEGIN
+            UPDATE reviews_version SET version = version + 1;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+    """)
+    cur.execute("DROP TRIGGER IF EXISTS reviews_version_bump ON reviews;")
+    cur.execute("""
+        CREATE TRIGGER reviews_version_bump
+        AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON reviews
+        FOR EACH STATEMENT EXECUTE FUNCTION bump_reviews_version();
+    """)
+    conn.commit()
+    print("Version trigger created.")
+
     # Indexes
     print("Creating indexes...")
 
@@ -76,6 +108,104 @@ try:
     conn.commit()
     print("  - points_price")
 
+    # Matches the best-rated ordering including its id tiebreaker, for keyset paging
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_reviews_points_price_id
+        ON reviews (points DESC NULLS LAST, price NULLS LAST, id);
+    """)
+    conn.commit()
+    print("  - points_price_id")
+
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_reviews_search_tsv
+        ON reviews USING gin (search_tsv);
+    """)
+    conn.commit()
+    print("  - search_tsv (GIN)")
+
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_reviews_title_trgm
+        ON reviews USING gin (title gin_trgm_ops);
+    """)
+    conn.commit()
+    print("  - title (trigram)")
+
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_reviews_winery_trgm
+        ON reviews USING gin (winery gin_trgm_ops);
+    """)
+    conn.commit()
+    print("  - winery (trigram)")
+
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_reviews_country_lower ON reviews (LOWER(country));")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_reviews_variety_lower ON reviews (LOWER(variety));")
+    conn.commit()
+    print("  - country, variety")
+
+    # Summary views, refreshed by load_embeddings.py after each ingest
+    print("Creating summary views...")
+
+    top_lists = " UNION ALL ".join(
+        f"""
+        SELECT '{facet}' AS facet, {facet} AS facet_value,
+               ROW_NUMBER() OVER (
+                   PARTITION BY {facet}
+                   ORDER BY points DESC NULLS LAST, price NULLS LAST, id
+               ) AS rank,
+               {SELECT_COLS}
+        FROM reviews
+        WHERE {facet} IS NOT NULL
+        """
+        for facet in FACET_COLUMNS
+    )
+    cur.execute(f"""
+        CREATE MATERIALIZED VIEW IF NOT EXISTS reviews_top_by_facet AS
+        SELECT * FROM ({top_lists}) AS ranked
+        WHERE rank <= {FACET_TOP_N};
+    """)
+    cur.execute("""
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_reviews_top_by_facet
+        ON reviews_top_by_facet (facet, facet_value, rank);
+    """)
+    # Lookups match facet_value case-insensitively; the unique index above is
+    # only usable on its facet prefix for that, and REFRESH CONCURRENTLY needs it plain
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_reviews_top_by_facet_lower
+        ON reviews_top_by_facet (facet, LOWER(facet_value), rank);
+    """)
+    conn.commit()
+    print("  - reviews_top_by_facet")
+
+    cur.execute("""
+        CREATE MATERIALIZED VIEW IF NOT EXISTS reviews_facet_stats AS
+        SELECT
+            CONCAT_WS(',',
+                CASE WHEN GROUPING(country) = 0 THEN 'country' END,
+                CASE WHEN GROUPING(taster_name) = 0 THEN 'taster_name' END,
+                CASE WHEN GROUPING(variety) = 0 THEN 'variety' END
+            ) AS grouping,
+            COALESCE(country, '') AS country,
+            COALESCE(taster_name, '') AS taster_name,
+            COALESCE(variety, '') AS variety,
+            COUNT(*) AS review_count,
+            AVG(points) AS avg_points,
+            PERCENTILE_CONT(0.25) WITHIN GROUP (ORDER BY price) AS price_p25,
+            PERCENTILE_CONT(0.5) WITHIN GROUP (ORDER BY price) AS price_median,
+            PERCENTILE_CONT(0.75) WITHIN GROUP (ORDER BY price) AS price_p75
+        FROM reviews
+        GROUP BY GROUPING SETS (
+            (taster_name), (country), (variety),
+            (country, taster_name), (taster_name, variety), (country, variety)
+        );
+    """)
+    # REFRESH ... CONCURRENTLY needs a unique index over plain, non-null columns
+    cur.execute("""
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_reviews_facet_stats
+        ON reviews_facet_stats (grouping, country, taster_name, variety);
+    """)
+    conn.commit()
+    print("  - reviews_facet_stats")
+
     print("Database setup complete!")
 except Exception as e:
     print("Error during setup:", e)
@@ -0,0 +1,107 @@
+"""
+Measure how well cosine thresholds separate paraphrases from different requests.
+
+The result cache is keyed on the embedding of the bare user query; memories and
+image description have to match exactly. So each pair here is the bare query
+text, embedded with the same model. A threshold is good when paraphrases score
+above it (cache hits) and different requests score below it (no false hits). False hits matter more than missed hits.
+
+Each run is appended to cache_threshold_runs.jsonl. Set RESULT_CACHE_THRESHOLD
+in config.py from a recorded run, note which one in the comment there, and only
+then turn on RESULT_CACHE_ENABLED.
+"""
+import json
+from datetime import datetime, timezone
+
+from dotenv import load_dotenv
+from openai import OpenAI
+
+from config import EMBEDDING_MODEL, RESULT_CACHE_THRESHOLD
+
+load_dotenv()
+client = OpenAI()
+
+# (query_a, query_b, is_paraphrase)
+PARAPHRASE_CORPUS = [
+    ("cheap pinot from Oregon", "inexpensive Oregon pinot noir", True),
+    ("bold red wine from Napa", "full-bodied Napa Valley red", True),
+    ("crisp white to go with oysters", "a refreshing white wine that pairs with oysters", True),
+    ("affordable Malbec from Argentina", "budget Argentinian Malbec", True),
+    ("sparkling wine for a celebration", "bubbly to celebrate with", True),
+    ("dry Riesling from Germany", "German dry Riesling", True),
+    ("fruity rosé from Provence", "Provence rosé with lots of fruit", True),
+    ("oaky buttery Chardonnay", "Chardonnay with butter and oak notes", True),
+    ("sweet dessert wine", "a sweet wine for dessert", True),
+    ("earthy Italian red with cherry notes", "Italian red wine, earthy, tastes of cherry", True),
+    ("cheap pinot from Oregon", "cheap pinot from New Zealand", False),
+    ("bold red wine from Napa", "light red wine from Burgundy", False),
+    ("crisp white to go with oysters", "red wine to go with steak", False),
+    ("affordable Malbec from Argentina", "affordable Carmenère from Chile", False),
+    ("sparkling wine for a celebration", "still white wine for dinner", False),
+    ("dry Riesling from Germany", "sweet Riesling from Germany", False),
+    ("fruity rosé from Provence", "fruity Beaujolais", False),
+    ("oaky buttery Chardonnay", "unoaked Chablis", False),
+    ("sweet dessert wine", "dry aperitif wine", False),
+    ("earthy Italian red with cherry notes", "earthy Spanish red with plum notes", False),
+]
+
+THRESHOLDS = [0.80, 0.82, 0.84, 0.86, 0.88, 0.90, 0.92, 0.94, 0.96]
+RUNS_LOG = 'cache_threshold_runs.jsonl'
+
+
+def cosine(a, b):
+    dot = sum(x * y for x, y in zip(a, b))
+    norm_a = sum(x * x for x in a) ** 0.5
+    norm_b = sum(x * x for x in b) ** 0.5
+    return dot / (norm_a * norm_b)
+
+
+def score_pairs():
+    texts = sorted({text for a, b, _ in PARAPHRASE_CORPUS for text in (a, b)})
+    response = client.embeddings.create(model=EMBEDDING_MODEL, input=texts)
+    embeddings = {text: item.embedding for text, item in zip(texts, response.data)}
+    return [
+        (a, b, is_paraphrase, cosine(embeddings[a], embeddings[b]))
+        for a, b, is_paraphrase in PARAPHRASE_CORPUS
+    ]
+
+
+def report(scored):
+    for a, b, is_paraphrase, score in sorted(scored, key=lambda item: -item[3]):
+        label = "same" if is_paraphrase else "diff"
+        print(f"{score:.3f}  {label}  {a!r} / {b!r}")
+
+    print()
+    print("threshold  hit-rate  false-hits")
+    paraphrases = [score for _, _, same, score in scored if same]
+    different = [score for _, _, same, score in scored if not same]
+    table = []
+    for threshold in THRESHOLDS:
+        hit_rate = sum(score >= threshold for score in paraphrases) / len(paraphrases)
+        false_hits = sum(score >= threshold for score in different)
+        marker = "  <- current" if threshold == RESULT_CACHE_THRESHOLD else ""
+        print(f"{threshold:9.2f}  {hit_rate:8.0%}  {false_hits:10d}{marker}")
+        table.append({'threshold': threshold, 'hit_rate': hit_rate, 'false_hits': false_hits})
+    return table
+
+
+def record(scored, table):
+    """Append this run to RUNS_LOG so the chosen threshold can point at it."""
+    run = {
+        'time': datetime.now(timezone.utc).isoformat(),
+        'model': EMBEDDING_MODEL,
+        'current_threshold': RESULT_CACHE_THRESHOLD,
+        'pairs': [
+            {'a': a, 'b': b, 'paraphrase': is_paraphrase, 'score': round(score, 4)}
+            for a, b, is_paraphrase, score in scored
+        ],
+        'thresholds': table,
+    }
+    with open(RUNS_LOG, 'a') as file:
+        file.write(json.dumps(run) + '\n')
+    print(f"\nRecorded run in {RUNS_LOG}")
+
+
+if __name__ == "__main__":
+    scored = score_pairs()
+    record(scored, report(scored))